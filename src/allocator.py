@@ -80,6 +80,7 @@ class Allocator (object):
             self.rwmap: self.romap,
             self.rrbuf: self.robuf,
             self.rwbuf: self.robuf,
+            self.rwpiece: self.robuf,
             self.rwfd : self.rofd,
             self.rwblk: self.roblk,
             self.rrvm : self.rovm,
@@ -87,12 +88,14 @@ class Allocator (object):
 
     def __get_alt_class(self, cls):
         return { # no alternative for rofd, roblk and rovm
-            self.romap: self.robuf,
+            self.romap: self.rowmap,
+            self.rowmap: self.robuf,
             self.rrmap: self.rwbuf,
             self.rwmap: self.rrmap,
             self.robuf: self.rofd,
             self.rrbuf: self.rwfd,
             self.rwbuf: self.rrbuf,
+            self.rwpiece: self.rwbuf,
             self.rwfd : self.rofd,
             self.rwblk: self.roblk,
             self.rrvm : self.rovm,
@@ -192,9 +195,11 @@ def iter_module_name():
     yield "romap"
     yield "rrmap"
     yield "rwmap"
+    yield "rowmap"
     yield "robuf"
     yield "rrbuf"
     yield "rwbuf"
+    yield "rwpiece"
     yield "rofd"
     yield "rwfd"
     yield "roblk"
@@ -23,9 +23,11 @@
 
 import errno
 
+from . import directio
 from . import filebytes
 from . import fileobj
 from . import kernel
+from . import setting
 from . import util
 
 enabled = kernel.is_blkdev_supported()
@@ -54,6 +56,13 @@ class methods (object):
     def get_blk_sector_size(self):
         return self.blk_sector_size
 
+    def open_blk(self, mode):
+        if setting.use_direct_io:
+            return directio.fopen(self.get_path(), mode,
+                self.get_sector_size())
+        else:
+            return kernel.fopen(self.get_path(), mode)
+
     def creat_blk(self):
         raise fileobj.Error("Can only write to " + self.get_path())
 
@@ -22,14 +22,17 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from __future__ import division
+import zlib
 
 from . import filebytes
 from . import fileops
+from . import manifest
 from . import util
+from . import worker
 
-def blkcmp(args, verbose):
+def blkcmp(args, cmp_type, verbose):
     try:
-        ret = _blkcmp(args, verbose, util.printf, util.printe)
+        ret = _blkcmp(args, cmp_type, verbose, util.printf, util.printe)
         if ret == -1:
             return -1
         assert ret in (0, 1), ret
@@ -38,12 +41,59 @@ def blkcmp(args, verbose):
         util.printe(e)
         return -1
 
-def _blkcmp(args, verbose, printf, printe):
-    # require minimum 2 paths
-    if len(args) < 2:
+def is_cmp_type(s):
+    cmp_type = s.lower().split(",")[0]
+    if cmp_type in ("", "raw", "crc32"):
+        return True
+    return util.get_hash_object(cmp_type) is not None
+
+def _blkcmp(args, s, verbose, printf, printe):
+    # extract option string
+    s = s.lower()
+    if "," in s:
+        l = s.split(",")
+        cmp_type = l[0]
+        optl = l[1:]
+    else:
+        cmp_type = s
+        optl = []
+    if cmp_type == "":
+        cmp_type = "raw"
+
+    digest = False
+    use_manifest = False
+    for opt in optl:
+        if opt == "digest":
+            digest = True
+        elif opt == "manifest":
+            use_manifest = True
+        else:
+            printe("Invalid option \"{0}\"".format(opt))
+            return -1
+    if use_manifest and cmp_type == "crc32":
+        printe("Manifest requires \"<hash_algorithm>\"")
+        return -1
+
+    # test if cmp_type exists
+    if cmp_type not in ("raw", "crc32"):
+        if util.get_hash_object(cmp_type) is None:
+            printe("No such hash algorithm \"{0}\", "
+                "supported hash algorithms are as follows".format(cmp_type))
+            printe("{0}".format(" ".join(util.get_available_hash_algorithms())))
+            printe("Specify paths before --blkcmp, or use --blkcmp=<cmp_type>")
+            return -1
+
+    # require minimum 2 paths unless printing digests
+    if len(args) < (1 if digest else 2):
         printe("Not enough paths {0}".format(args))
         return -1
 
+    if use_manifest:
+        return _blkcmp_manifest(args, cmp_type, digest, verbose, printf,
+            printe)
+    elif digest and cmp_type == "raw":
+        cmp_type = "sha256"
+
     # allocate fileops
     opsl, cleanup, blksiz = fileops.bulk_alloc_blk(args, True, printf, printe)
     if opsl is None:
@@ -62,24 +112,109 @@ def _blkcmp(args, verbose, printf, printe):
 
     # start comparison
     cmpsiz = max([ops.get_size() for ops in opsl])
-    resid = cmpsiz
-    offset = 0
+    arg = cmp_type, digest, blksiz, fmt, cmpsiz, verbose
     mismatch = False
 
+    if worker.is_parallel():
+        try:
+            for l in _iter_stripe_result(args, opsl, arg):
+                for s, bad in l:
+                    printf(s)
+                    if bad:
+                        mismatch = True
+        except Exception as e:
+            printe(e)
+            cleanup()
+            return -1
+    else:
+        for s, bad in _iter_block_result(opsl, arg, 0, cmpsiz):
+            printf(s)
+            if bad:
+                mismatch = True
+
+    printf("scanned {0} blocks".format(util.howmany(cmpsiz, blksiz)))
+    if not mismatch and len(opsl) > 1:
+        printf("success")
+
+    # done
+    cleanup()
+    return 1 if mismatch else 0
+
+def _iter_stripe_result(args, opsl, arg):
+    # stripes are block aligned, and results are yielded in offset order
+    cmp_type, digest, blksiz, fmt, cmpsiz, verbose = arg
+    stripe = worker.get_stripe_size(blksiz)
+    l = [(arg, beg, end) for beg, end in worker.iter_stripe(cmpsiz, stripe)]
+    cleanupl = []
+    if worker.use_process(opsl):
+        pool = worker.alloc_process_pool(_alloc_worker_fileops, args)
+    else:
+        # fileops aren't thread safe, allocate a set per thread
+        ll = []
+        for _ in util.get_xrange(worker.get_count()):
+            ret, cleanup, _ = fileops.bulk_alloc_blk(args, True, None, None)
+            if ret is None:
+                for fn in cleanupl:
+                    fn()
+                raise util.GenericError("Failed to allocate fileops")
+            ll.append(ret)
+            cleanupl.append(cleanup)
+        pool = worker.alloc_thread_pool(ll)
+    try:
+        for ret in pool.imap(_cmp_stripe, l):
+            yield ret
+    finally:
+        pool.terminate()
+        pool.join()
+        for fn in cleanupl:
+            fn()
+
+def _alloc_worker_fileops(args):
+    opsl, _, _ = fileops.bulk_alloc_blk(args, True, None, None)
+    return opsl
+
+def _cmp_stripe(l):
+    arg, beg, end = l
+    opsl = worker.local.arg
+    if opsl is None:
+        raise util.GenericError("Failed to allocate fileops")
+    return list(_iter_block_result(opsl, arg, beg, end))
+
+def get_digest_callback(cmp_type):
+    if cmp_type == "raw":
+        return None # compare buffers as is
+    elif cmp_type == "crc32":
+        def fn(b):
+            return "{0:08x}".format(zlib.crc32(b) & 0xFFFFFFFF)
+    else:
+        def fn(b):
+            return util.get_hash_string(cmp_type, b)
+    return fn
+
+def _iter_block_result(opsl, arg, beg, end):
+    cmp_type, digest, blksiz, fmt, cmpsiz, verbose = arg
+    assert beg % blksiz == 0, (beg, blksiz)
+    fn = get_digest_callback(cmp_type)
+    zero = filebytes.ZERO * blksiz
+    zero_digest = None
+    resid = end - beg
+    offset = beg
+
     while resid > 0:
         # collect block buffers
         bufl = []
-        shal = []
         phyl = [] # physical
         rell = [] # relative (nonexistent unless with @)
         for ops in opsl:
             mapping_offset = ops.get_mapping_offset()
             if offset <= ops.get_max_pos():
-                buf = ops.read(offset, blksiz)
+                if ops.is_hole(offset, blksiz):
+                    buf = zero # no need to read
+                else:
+                    buf = ops.read(offset, blksiz)
             else:
                 buf = filebytes.BLANK # for debug mode
             bufl.append(buf)
-            shal.append(util.get_sha256(buf))
             phyl.append(mapping_offset + offset)
             if mapping_offset:
                 rell.append(offset)
@@ -94,21 +229,29 @@ def _blkcmp(args, verbose, printf, printe):
         assert maxsiz <= blksiz, (blksiz, maxsiz)
 
         # test if block buffer matches
-        if len(set(shal)) != 1:
-            mismatch = True
-            blkidx = offset // blksiz
-            blkper = offset / cmpsiz * 100
-            l = []
-            l.append("#{0} {1:.1f}% ".format(blkidx, blkper))
-            l.append(concat_offsets(fmt, phyl, rell, 0))
-            l.append(" -> ")
-            index, values, contig, count = scan_buffer_list(bufl)
-            l.append("{0} ".format(index))
-            l.append(concat_offsets(fmt, phyl, rell, index))
-            misper = count / maxsiz * 100
-            l.append(" {0} {1} {2}/{3} {4:.1f}%".format(values, contig, count,
-                maxsiz, misper))
-            printf("".join(l))
+        if fn:
+            hl = []
+            for buf in bufl:
+                if buf is zero:
+                    if zero_digest is None:
+                        zero_digest = fn(zero)
+                    hl.append(zero_digest)
+                else:
+                    hl.append(fn(buf))
+        else:
+            hl = bufl
+        bad = False
+        for x in hl[1:]:
+            if x != hl[0]:
+                bad = True
+                break
+
+        blkidx = offset // blksiz
+        if digest:
+            yield get_digest_string(fmt, blkidx, phyl, rell, hl), bad
+        elif bad:
+            yield get_mismatch_string(fmt, blkidx, offset, cmpsiz, phyl, rell,
+                bufl), bad
 
         # must be last if maxsiz != blksiz
         offset += maxsiz
@@ -116,14 +259,138 @@ def _blkcmp(args, verbose, printf, printe):
         if maxsiz != blksiz:
             assert resid == 0, (offset, resid, cmpsiz, blksiz, maxsiz)
 
+def _blkcmp_manifest(args, hash_algo, digest, verbose, printf, printe):
+    # paths of saved manifests are compared without the original files
+    live = [f for f in args if not manifest.is_manifest(f)]
+    if live:
+        opsl, cleanup, blksiz = fileops.bulk_alloc_blk(live, True, printf,
+            printe)
+        if opsl is None:
+            return -1
+    else:
+        opsl, cleanup, blksiz = (), None, None
+
+    # test if paths are unique
+    l = [ops.get_path() for ops in opsl]
+    if len(set(l)) != len(l):
+        printe("Not unique paths {0}".format(l))
+        cleanup()
+        return -1
+
+    # load saved manifests in the order of args
+    srcl = []
+    i = 0
+    try:
+        for f in args:
+            if f in live:
+                srcl.append([opsl[i], None])
+                i += 1
+            else:
+                o = manifest.load(f)
+                if blksiz is None:
+                    blksiz = o.block_size
+                if hash_algo == "raw":
+                    hash_algo = o.hash_algo
+                if o.block_size != blksiz:
+                    raise manifest.Error(
+                        "Block size mismatch {0} for {1}".format(
+                        o.block_size, f))
+                if o.hash_algo != hash_algo:
+                    raise manifest.Error(
+                        "Hash algorithm mismatch \"{0}\" for {1}".format(
+                        o.hash_algo, f))
+                srcl.append([None, o])
+        if hash_algo == "raw":
+            hash_algo = "sha256"
+
+        # only read blocks without valid entries
+        for l in srcl:
+            ops = l[0]
+            if ops:
+                l[1] = manifest.get(ops, blksiz, hash_algo)
+                manifest.update(ops, l[1], False)
+                if verbose:
+                    printf(str(l[1]))
+    except Exception as e:
+        printe(e)
+        if cleanup:
+            cleanup()
+        return -1
+
+    # determine output format
+    n = max([o.offset + o.size for ops, o in srcl])
+    fmt = util.get_offset_format(n)
+
+    # start comparison
+    cmpsiz = max([o.size for ops, o in srcl])
+    mismatch = False
+
+    for blkidx in util.get_xrange(util.howmany(cmpsiz, blksiz)):
+        offset = blkidx * blksiz
+        hl = []
+        phyl = [] # physical
+        rell = [] # relative (nonexistent unless with @)
+        for ops, o in srcl:
+            if blkidx < len(o.blocks):
+                hl.append(o.blocks[blkidx])
+            else:
+                hl.append(None)
+            phyl.append(o.offset + offset)
+            if o.offset:
+                rell.append(offset)
+            else:
+                rell.append(None)
+        if not verbose and len(set(phyl)) == 1:
+            phyl = phyl[:1]
+            rell = rell[:1]
+
+        # test if block digest matches
+        bad = len(set(hl)) != 1
+        if bad:
+            mismatch = True
+        if digest:
+            printf(get_digest_string(fmt, blkidx, phyl, rell, hl))
+        elif bad:
+            if live and len(live) == len(srcl):
+                bufl = []
+                for ops, o in srcl:
+                    if offset <= ops.get_max_pos():
+                        bufl.append(ops.read(offset, blksiz))
+                    else:
+                        bufl.append(filebytes.BLANK)
+                printf(get_mismatch_string(fmt, blkidx, offset, cmpsiz, phyl,
+                    rell, bufl))
+            else: # no buffer to scan
+                printf(get_digest_string(fmt, blkidx, phyl, rell, hl))
+
     printf("scanned {0} blocks".format(util.howmany(cmpsiz, blksiz)))
-    if not mismatch:
+    if not mismatch and len(srcl) > 1:
         printf("success")
 
     # done
-    cleanup()
+    if cleanup:
+        cleanup()
     return 1 if mismatch else 0
 
+def get_digest_string(fmt, blkidx, phyl, rell, hl):
+    return "#{0} {1} {2}".format(blkidx, concat_offsets(fmt, phyl, rell, 0),
+        "|".join([str(x) for x in hl]))
+
+def get_mismatch_string(fmt, blkidx, offset, cmpsiz, phyl, rell, bufl):
+    maxsiz = max([len(buf) for buf in bufl])
+    blkper = offset / cmpsiz * 100
+    l = []
+    l.append("#{0} {1:.1f}% ".format(blkidx, blkper))
+    l.append(concat_offsets(fmt, phyl, rell, 0))
+    l.append(" -> ")
+    index, values, contig, count = scan_buffer_list(bufl)
+    l.append("{0} ".format(index))
+    l.append(concat_offsets(fmt, phyl, rell, index))
+    misper = count / maxsiz * 100
+    l.append(" {0} {1} {2}/{3} {4:.1f}%".format(values, contig, count,
+        maxsiz, misper))
+    return "".join(l)
+
 def concat_offsets(fmt, phyl, rell, delta):
     l = []
     for i, phy in enumerate(phyl):
@@ -22,10 +22,15 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from __future__ import division
+import binascii
+import os
+import stat
 import sys
 
 from . import filebytes
 from . import fileops
+from . import kernel
+from . import log
 from . import panel
 from . import screen
 from . import setting
@@ -125,6 +130,23 @@ def build_binary_line(b, fn, bpl, bpu):
 def build_text_line(b, fn):
     return "".join([fn(x) for x in b])
 
+def get_block_binary_callback(bpl, bpu):
+    # format whole block at once, and let caller slice it per line
+    if not util.is_python_version_or_ht(3, 8):
+        return None, None
+    if setting.use_lower_case_hex:
+        def fn(buf):
+            return binascii.hexlify(buf, " ", -bpu).decode()
+    else:
+        def fn(buf):
+            return binascii.hexlify(buf, " ", -bpu).decode().upper()
+    n = (bpl // bpu) * (bpu * 2 + 1) # including trailing space
+    return fn, n
+
+def get_block_text_table():
+    return util.str_to_bytes("".join(
+        [screen.chr_repr[x] for x in util.get_xrange(0, 256)]))
+
 def blkdump_text(opsl, blksiz, verbose, printf, printe):
     bpl = get_bpl(blksiz)
     bpu = get_bpu(bpl)
@@ -141,6 +163,9 @@ def blkdump_text(opsl, blksiz, verbose, printf, printe):
             return d[x]
         def tfn(x):
             return screen.chr_repr[x]
+    hfn, hlen = get_block_binary_callback(bpl, bpu)
+    table = get_block_text_table()
+    zero = filebytes.ZERO * blksiz
 
     for i, ops in enumerate(opsl):
         if len(opsl) > 1:
@@ -153,22 +178,47 @@ def blkdump_text(opsl, blksiz, verbose, printf, printe):
         prev_was_asterisk = False
 
         while resid > 0:
-            buf = ops.read(offset, blksiz)
+            if ops.is_hole(offset, blksiz):
+                buf = zero # no need to read
+                if not verbose and prev == buf[:bpl]:
+                    # all lines are collapsed
+                    if not prev_was_asterisk:
+                        printf("*")
+                        prev_was_asterisk = True
+                    resid -= len(buf)
+                    offset += len(buf)
+                    continue
+            else:
+                buf = ops.read(offset, blksiz)
             assert len(buf) > 0, (offset, blksiz, len(buf))
+            bs = None
+            ts = None
+            l = [] # print once per block
             x = offset
             while x < offset + len(buf):
                 s = build_offset_string(fmt, mapping_offset, x)
-                b = buf[x-offset:x-offset+bpl]
+                j = x - offset
+                b = buf[j:j+bpl]
                 if b != prev or verbose:
-                    printf("{0} {1} {2}".format(s,
-                        build_binary_line(b, bfn, bpl, bpu),
-                        build_text_line(b, tfn)))
+                    if hfn and len(b) == bpl:
+                        if bs is None:
+                            bs = hfn(buf)
+                            ts = util.bytes_to_str(buf.translate(table))
+                        k = j // bpl * hlen
+                        l.append("{0} {1} {2}".format(s, bs[k:k+hlen-1],
+                            ts[j:j+bpl]))
+                    else:
+                        l.append("{0} {1} {2}".format(s,
+                            build_binary_line(b, bfn, bpl, bpu),
+                            build_text_line(b, tfn)))
                     prev_was_asterisk = False
                 elif not prev_was_asterisk:
-                    printf("*")
+                    l.append("*")
                     prev_was_asterisk = True
                 prev = b
                 x += bpl
+            if l:
+                printf("\n".join(l))
             resid -= len(buf)
             offset += len(buf)
         assert resid == 0, resid
@@ -180,20 +230,70 @@ def blkdump_text(opsl, blksiz, verbose, printf, printe):
 
 def blkdump_raw(opsl, blksiz, verbose, fd):
     if util.is_python2():
-        def fn(b):
-            fd.write(b)
+        wfd = fd
     else:
-        def fn(b):
-            fd.buffer.write(b)
+        wfd = fd.buffer
+    copy = get_zero_copy_callback(fd)
 
     for ops in opsl:
-        resid = ops.get_size()
-        offset = 0
-        while resid > 0:
-            buf = ops.read(offset, blksiz)
-            assert len(buf) > 0, (offset, blksiz, len(buf))
-            fn(buf)
-            resid -= len(buf)
-            offset += len(buf)
-        assert resid == 0, resid
-    fd.flush()
+        if fileops.is_concatenated(ops):
+            l = ops.iter_fileops()
+        else:
+            l = ops,
+        for o in l:
+            resid = o.get_size()
+            offset = 0
+            # copy within kernel if possible
+            if copy and not o.is_dirty():
+                fileno = o.get_fileno()
+                if fileno != -1:
+                    wfd.flush()
+                    n = copy(fileno, o.get_mapping_offset(), resid)
+                    resid -= n
+                    offset += n
+            while resid > 0:
+                buf = o.raw_read(offset, blksiz)
+                assert len(buf) > 0, (offset, blksiz, len(buf))
+                wfd.write(buf)
+                resid -= len(buf)
+                offset += len(buf)
+            assert resid == 0, resid
+    wfd.flush()
+
+def get_zero_copy_callback(fd):
+    try:
+        dst = fd.fileno()
+        mode = os.fstat(dst).st_mode
+    except Exception:
+        return None
+    if stat.S_ISREG(mode) and hasattr(os, "copy_file_range"):
+        def fn(src, offset, size):
+            return __zero_copy(lambda x, n: os.copy_file_range(src, dst, n,
+                x), offset, size)
+    elif stat.S_ISFIFO(mode) and hasattr(os, "splice"):
+        def fn(src, offset, size):
+            return __zero_copy(lambda x, n: os.splice(src, dst, n, x),
+                offset, size)
+    elif kernel.is_linux() and hasattr(os, "sendfile"):
+        # output can be other than socket on Linux
+        def fn(src, offset, size):
+            return __zero_copy(lambda x, n: os.sendfile(dst, src, x, n),
+                offset, size)
+    else:
+        return None
+    return fn
+
+def __zero_copy(fn, offset, size):
+    # return copied size, rest is read and written by caller
+    resid = size
+    while resid > 0:
+        try:
+            n = fn(offset, min(resid, 1 << 30))
+        except OSError as e:
+            log.debug("Zero copy failed at {0}, {1}".format(offset, e))
+            break
+        if n <= 0:
+            break
+        offset += n
+        resid -= n
+    return size - resid
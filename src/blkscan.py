@@ -21,9 +21,12 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import binascii
+
 from . import filebytes
 from . import fileops
 from . import util
+from . import worker
 
 def blkscan(args, scan_type, verbose):
     try:
@@ -46,6 +49,17 @@ def _blkscan(args, scan_type, verbose, printf, printe):
     else:
         afn = fileops.concat_alloc_blk
 
+    # extract option string
+    scanl = []
+    bitmap = False
+    for x in s.split(","):
+        if x == "bitmap":
+            bitmap = True
+        else:
+            scanl.append(x)
+    if not scanl:
+        scanl.append("zero")
+
     opsl, cleanup, blksiz = afn(args, True, printf, printe)
     if opsl is None:
         return -1
@@ -54,78 +68,201 @@ def _blkscan(args, scan_type, verbose, printf, printe):
     assert isinstance(opsl, tuple), opsl
 
     # define callback
-    if s in ("z", "zero"):
-        z = filebytes.ZERO * blksiz
-        def fn(b):
-            return b == z, None
-    elif s in ("nz", "nzero", "nonzero", "notzero"):
-        z = filebytes.ZERO * blksiz
-        def fn(b):
-            return b != z, None
-    elif s in ("f", "ff"):
-        ff = filebytes.FF * blksiz
-        def fn(b):
-            return b == ff, None
-    elif s in ("nf", "nff", "nonff", "notff"):
-        ff = filebytes.FF * blksiz
-        def fn(b):
-            return b != ff, None
-    elif ":" in s:
-        hash_algo, h = s.split(":")
-        if hash_algo == "":
-            hash_algo = "sha256"
-        fn = get_md_callback(hash_algo, h, printe)
-    else:
-        fn = get_md_callback(s, None, printe)
+    fn = get_scan_callback(scanl, blksiz, printe)
     if not fn:
         cleanup()
         return -1
 
+    # allocate worker pool
+    pool = None
+    if worker.is_parallel():
+        try:
+            pool, pool_cleanup = _alloc_pool(afn, args, opsl)
+        except Exception as e:
+            printe(e)
+            cleanup()
+            return -1
+
     # start block scan
-    for i, ops in enumerate(opsl):
-        if len(opsl) > 1:
-            printf(ops.get_path())
-        mapping_offset = ops.get_mapping_offset()
-        fmt = util.get_offset_format(mapping_offset + ops.get_size())
-        resid = ops.get_size()
-        remain = resid - util.rounddown(resid, blksiz)
-        assert 0 <= remain < blksiz, (remain, blksiz)
-        offset = 0
-        match_blk = 0
-        total_blk = 0
-
-        while resid > 0:
-            buf = ops.read(offset, blksiz)
-            matched, extra = fn(buf)
+    try:
+        for i, ops in enumerate(opsl):
+            if len(opsl) > 1:
+                printf(ops.get_path())
+            if pool:
+                l = [(i, scanl, blksiz, beg, end) for beg, end in
+                    worker.iter_stripe(ops.get_size(),
+                    worker.get_stripe_size(blksiz))]
+                g = (x for ret in pool.imap(_scan_stripe, l) for x in ret)
+            else:
+                g = _iter_block_result(ops, fn, blksiz, 0, ops.get_size())
+            _scan_fileops(ops, g, scanl, blksiz, bitmap, printf)
+            if len(opsl) > 1 and i != len(opsl) - 1:
+                printf("")
+    except Exception as e:
+        if not pool:
+            raise
+        printe(e)
+        return -1
+    finally:
+        if pool:
+            pool_cleanup()
+        cleanup()
+
+def _scan_fileops(ops, g, scanl, blksiz, bitmap, printf):
+    mapping_offset = ops.get_mapping_offset()
+    fmt = util.get_offset_format(mapping_offset + ops.get_size())
+    resid = ops.get_size()
+    remain = resid - util.rounddown(resid, blksiz)
+    assert 0 <= remain < blksiz, (remain, blksiz)
+    total_blk = util.howmany(resid, blksiz)
+    match_blk = [0] * len(scanl)
+    if bitmap:
+        # bit N of byte N/8 (LSB first) is set if block N matched
+        bitmapl = [bytearray(util.howmany(total_blk, 8)) for x in scanl]
+
+    for offset, siz, retl in g:
+        l = []
+        for i, ret in enumerate(retl):
+            matched, extra = ret
             if matched:
-                if extra is None:
-                    extra = ""
-                sp = fmt.format(mapping_offset + offset)
-                if mapping_offset:
-                    s = "{0}|{1} {2}".format(sp, fmt.format(offset), extra)
+                match_blk[i] += 1
+                if bitmap:
+                    blkidx = offset // blksiz
+                    bitmapl[i][blkidx >> 3] |= 1 << (blkidx & 7)
+                elif len(scanl) == 1:
+                    l.append("" if extra is None else extra)
+                elif extra is None:
+                    l.append(scanl[i])
                 else:
-                    s = "{0} {1}".format(sp, extra)
-                s = s.rstrip()
-                if len(buf) != blksiz:
-                    assert len(buf) == resid, (offset, blksiz, len(buf))
-                    assert len(buf) == remain, (offset, blksiz, len(buf))
-                    s += " *"
-                printf(s)
-                match_blk += 1
-            resid -= len(buf)
-            offset += len(buf)
-            total_blk += 1
-        assert resid == 0, resid
-
-        printf("{0}/{1} {2} bytes blocks matched".format(match_blk, total_blk,
-            blksiz))
-        if remain:
-            printf("last {0} bytes not block sized".format(remain))
-        if len(opsl) > 1 and i != len(opsl) - 1:
-            printf("")
-
-    # done
-    cleanup()
+                    l.append("{0}:{1}".format(scanl[i], extra))
+        if l:
+            sp = fmt.format(mapping_offset + offset)
+            if mapping_offset:
+                s = "{0}|{1} {2}".format(sp, fmt.format(offset), " ".join(l))
+            else:
+                s = "{0} {1}".format(sp, " ".join(l))
+            s = s.rstrip()
+            if siz != blksiz:
+                assert siz == resid, (offset, blksiz, siz)
+                assert siz == remain, (offset, blksiz, siz)
+                s += " *"
+            printf(s)
+        resid -= siz
+    assert resid == 0, resid
+
+    if bitmap:
+        for i, s in enumerate(scanl):
+            b = binascii.hexlify(bytes(bitmapl[i]))
+            printf("{0} {1}".format(s, util.bytes_to_str(b)).rstrip())
+    for i, s in enumerate(scanl):
+        if len(scanl) == 1:
+            s = ""
+        printf("{0}/{1} {2} bytes blocks matched {3}".format(match_blk[i],
+            total_blk, blksiz, s).rstrip())
+    if remain:
+        printf("last {0} bytes not block sized".format(remain))
+
+def _iter_block_result(ops, fn, blksiz, beg, end):
+    assert beg % blksiz == 0, (beg, blksiz)
+    offset = beg
+    zero = None
+    while offset < end:
+        # holes are read as zero
+        if ops.is_hole(offset, blksiz):
+            if zero is None:
+                zero = fn(filebytes.ZERO * blksiz)
+            yield offset, blksiz, zero
+            offset += blksiz
+            continue
+        buf = ops.read(offset, blksiz)
+        assert len(buf) > 0, (offset, blksiz, len(buf))
+        yield offset, len(buf), fn(buf)
+        offset += len(buf)
+
+def _alloc_pool(afn, args, opsl):
+    # stripes are block aligned, and results are merged in offset order
+    cleanupl = []
+    if worker.use_process(opsl):
+        pool = worker.alloc_process_pool(_alloc_worker_fileops, afn, args)
+    else:
+        # fileops aren't thread safe, allocate a set per thread
+        ll = []
+        for _ in util.get_xrange(worker.get_count()):
+            ret, cleanup, _ = afn(args, True, None, None)
+            if ret is None:
+                for fn in cleanupl:
+                    fn()
+                raise util.GenericError("Failed to allocate fileops")
+            if fileops.is_concatenated(ret):
+                ret = ret,
+            ll.append(ret)
+            cleanupl.append(cleanup)
+        pool = worker.alloc_thread_pool(ll)
+    def cleanup():
+        pool.terminate()
+        pool.join()
+        for fn in cleanupl:
+            fn()
+    return pool, cleanup
+
+def _alloc_worker_fileops(afn, args):
+    opsl, _, _ = afn(args, True, None, None)
+    if fileops.is_concatenated(opsl):
+        opsl = opsl,
+    return opsl
+
+def _scan_stripe(l):
+    i, scanl, blksiz, beg, end = l
+    opsl = worker.local.arg
+    if opsl is None:
+        raise util.GenericError("Failed to allocate fileops")
+    fn = get_scan_callback(scanl, blksiz, None)
+    return list(_iter_block_result(opsl[i], fn, blksiz, beg, end))
+
+def get_scan_callback(scanl, blksiz, printe):
+    # evaluate all scan types against each block,
+    # while sharing the result of comparison or digest among them
+    l = []
+    for s in scanl:
+        ret = get_predicate(s, blksiz, printe)
+        if not ret:
+            return
+        l.append(ret)
+    def fn(b):
+        d = {}
+        ret = []
+        for key, kfn, mfn in l:
+            if key not in d:
+                d[key] = kfn(b)
+            ret.append(mfn(d[key]))
+        return ret
+    return fn
+
+def get_predicate(s, blksiz, printe):
+    # (key, key callback, match callback)
+    if s in ("z", "zero", "nz", "nzero", "nonzero", "notzero"):
+        z = filebytes.ZERO * blksiz
+        def kfn(b):
+            return b == z
+        if s in ("z", "zero"):
+            return "zero", kfn, lambda x: (x, None)
+        else:
+            return "zero", kfn, lambda x: (not x, None)
+    elif s in ("f", "ff", "nf", "nff", "nonff", "notff"):
+        ff = filebytes.FF * blksiz
+        def kfn(b):
+            return b == ff
+        if s in ("f", "ff"):
+            return "ff", kfn, lambda x: (x, None)
+        else:
+            return "ff", kfn, lambda x: (not x, None)
+    elif ":" in s:
+        hash_algo, h = s.split(":")
+        if hash_algo == "":
+            hash_algo = "sha256"
+        return get_md_callback(hash_algo, h, printe)
+    else:
+        return get_md_callback(s, None, printe)
 
 def get_md_callback(hash_algo, h, printe):
     # taken from src/md.py
@@ -135,14 +272,13 @@ def get_md_callback(hash_algo, h, printe):
             "supported hash algorithms are as follows".format(hash_algo))
         printe("{0}".format(" ".join(util.get_available_hash_algorithms())))
         return
+    def kfn(b):
+        return util.get_hash_string(hash_algo, b)
     if h:
         for x in h:
             if x not in "0123456789abcdef":
                 printe("Invalid hash string {0}".format(h))
                 return
-        def fn(b):
-            return util.get_hash_string(hash_algo, b) == h, None
+        return hash_algo, kfn, lambda x: (x == h, None)
     else:
-        def fn(b):
-            return True, util.get_hash_string(hash_algo, b)
-    return fn
+        return hash_algo, kfn, lambda x: (True, x)
@@ -21,10 +21,11 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import array
+import collections
+import random
 
 from . import filebytes
-from . import fileobj
+from . import log
 from . import setting
 from . import util
 
@@ -33,9 +34,54 @@ class Chunk (object):
         assert offset >= 0
         if isinstance(buffer, str):
             buffer = util.str_to_bytes(buffer)
-        self.offset = offset
+        self.__offset = offset
         self.buffer = alloc_buffer(buffer)
         self.islast = islast
+        # ChunkList node
+        self.linked = False
+        self.prio = _random.random()
+        self.parent = None
+        self.left = None
+        self.right = None
+        self.total = len(self)
+        self.count = 1
+
+    # offset is derived from ChunkList if linked
+    def __get_offset(self):
+        if not self.linked:
+            return self.__offset
+        x = _get_total(self.left)
+        o = self
+        while o.parent is not None:
+            p = o.parent
+            if p.right is o:
+                x += _get_total(p.left) + len(p)
+            o = p
+        return x
+
+    def __set_offset(self, x):
+        assert not self.linked
+        self.__offset = x
+
+    offset = property(__get_offset, __set_offset)
+
+    def update(self):
+        self.total = len(self)
+        self.count = 1
+        if self.left is not None:
+            self.left.parent = self
+            self.total += self.left.total
+            self.count += self.left.count
+        if self.right is not None:
+            self.right.parent = self
+            self.total += self.right.total
+            self.count += self.right.count
+
+    def __update_path(self):
+        o = self
+        while o is not None:
+            o.update()
+            o = o.parent
 
     def __contains__(self, x):
         x -= self.offset
@@ -51,38 +97,17 @@ class Chunk (object):
         return "{0} {1}{2}".format(self.offset, len(self),
             " <last>" * self.islast)
 
-    def search(self, x, s, next_buffer):
-        b = self.read(x, len(self))
-        if next_buffer:
-            b += next_buffer
-        n = util.find_string(b, s)
-        if n >= 0:
-            return x + n
-        else:
-            return fileobj.NOTFOUND
-
-    def rsearch(self, x, s, next_buffer):
-        b = self.read(self.offset, x + 1 - self.offset)
-        if next_buffer:
-            b = next_buffer + b
-        n = util.rfind_string(b, s)
-        if n >= 0:
-            ret = self.offset + n
-            if next_buffer:
-                return ret - len(next_buffer)
-            else:
-                return ret
-        else:
-            return fileobj.NOTFOUND
+    def is_pinned(self):
+        return True
 
     def read(self, x, n):
         x = self.__get_local_offset(x)
-        return filebytes.join(self.buffer[x : x + n])
+        return read_buffer(self.buffer, x, n)
 
     def insert(self, x, l):
         x = self.__get_local_offset(x)
-        b = filebytes.input_to_bytes(l)
-        self.buffer[x : x] = alloc_buffer(b)
+        self.buffer[x : x] = filebytes.input_to_bytes(l)
+        self.__update_path()
         return len(l)
 
     def replace(self, x, l):
@@ -91,22 +116,22 @@ class Chunk (object):
         if x + len(l) > size:
             if self.islast:
                 nullsize = x + len(l) - size
-                self.buffer[size:] = alloc_buffer(filebytes.pad(nullsize))
+                self.buffer[size:] = filebytes.pad(nullsize)
+                self.__update_path()
             else:
                 l = l[:size - x]
         xx = x + len(l)
-        orig = filebytes.join(self.buffer[x : xx])
-        b = filebytes.input_to_bytes(l)
-        self.buffer[x : xx] = alloc_buffer(b)
+        orig = read_buffer(self.buffer, x, len(l))
+        self.buffer[x : xx] = filebytes.input_to_bytes(l)
         return len(l), orig
 
     def delete(self, x, n):
         x = self.__get_local_offset(x)
         if x + n > len(self):
             n = len(self) - x
-        xx = x + n
-        orig = filebytes.join(self.buffer[x : xx])
-        self.buffer[x : xx] = alloc_buffer(filebytes.BLANK)
+        orig = read_buffer(self.buffer, x, n)
+        del self.buffer[x : x + n]
+        self.__update_path()
         return n, orig
 
     def __get_local_offset(self, x):
@@ -114,9 +139,317 @@ class Chunk (object):
             assert x in self, (x, len(self), self.offset)
         return x - self.offset
 
-if util.is_python2(): # only works with python2
-    def alloc_buffer(b):
-        return array.array('c', b)
-else: # works with both python2 and python3
-    def alloc_buffer(b):
-        return filebytes.split(b)
+# Chunk read from file on the first access to its buffer, and dropped by
+# ChunkCache while it's unmodified and least recently used.
+class LazyChunk (Chunk):
+    def __init__(self, offset, file_offset, size, cache, islast=False):
+        self.file_offset = file_offset
+        self.dirty = False
+        self.__size = size
+        self.__cache = cache
+        self.__buffer = None
+        super(LazyChunk, self).__init__(offset, filebytes.BLANK, islast)
+        self.unload()
+        self.total = size
+
+    def __get_buffer(self):
+        if self.__buffer is None:
+            self.__buffer = alloc_buffer(self.__cache.load(self))
+        self.__cache.touch(self)
+        return self.__buffer
+
+    def __set_buffer(self, b):
+        self.__buffer = b
+
+    buffer = property(__get_buffer, __set_buffer)
+
+    def __len__(self):
+        if self.__buffer is None:
+            return self.__size
+        else:
+            return len(self.__buffer)
+
+    def __str__(self):
+        return "{0}{1}".format(super(LazyChunk, self).__str__(),
+            " <loaded>" * self.is_loaded())
+
+    def is_pinned(self):
+        return self.dirty
+
+    def is_loaded(self):
+        return self.__buffer is not None
+
+    def unload(self):
+        assert not self.dirty
+        self.__buffer = None
+
+    def insert(self, x, l):
+        self.dirty = True
+        return super(LazyChunk, self).insert(x, l)
+
+    def replace(self, x, l):
+        self.dirty = True
+        return super(LazyChunk, self).replace(x, l)
+
+    def delete(self, x, n):
+        self.dirty = True
+        return super(LazyChunk, self).delete(x, n)
+
+# LRU of loaded clean LazyChunk, modified ones are never dropped.
+class ChunkCache (object):
+    def __init__(self, fd, size):
+        assert size > 0, size
+        self.__fd = fd
+        self.__size = size
+        self.__lru = collections.OrderedDict()
+        self.load_count = 0
+        self.drop_count = 0
+
+    def __len__(self):
+        return len(self.__lru)
+
+    def __str__(self):
+        l = []
+        l.append("cache size {0}/{1}".format(len(self), self.__size))
+        l.append("cache load {0}".format(self.load_count))
+        l.append("cache drop {0}".format(self.drop_count))
+        return '\n'.join(l)
+
+    def close(self):
+        self.__fd.close()
+        self.__lru.clear()
+
+    def load(self, o):
+        n = len(o)
+        self.__fd.seek(o.file_offset)
+        b = self.__fd.read(n)
+        if len(b) < n: # file shrunk after open
+            log.error("Failed to read {0}[B] at {1}".format(n, o.file_offset))
+            b += filebytes.pad(n - len(b))
+        self.load_count += 1
+        return b
+
+    def touch(self, o):
+        k = id(o)
+        if k in self.__lru:
+            del self.__lru[k]
+        if o.dirty:
+            return
+        self.__lru[k] = o
+        while len(self.__lru) > self.__size:
+            k, oo = self.__lru.popitem(last=False)
+            if not oo.dirty:
+                oo.unload()
+                self.drop_count += 1
+
+# Chunks in offset order kept in a treap with subtree size and length,
+# so that lookup by index or offset and insert/remove are O(log n).
+class ChunkList (object):
+    def __init__(self, l=()):
+        self.__root = _build(list(l))
+
+    def __len__(self):
+        return _get_count(self.__root)
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def __reversed__(self):
+        return self.riter_from(len(self) - 1)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        o = self.__root
+        while True:
+            n = _get_count(o.left)
+            if i < n:
+                o = o.left
+            elif i == n:
+                return o
+            else:
+                i -= n + 1
+                o = o.right
+
+    def get_total(self):
+        return _get_total(self.__root)
+
+    def index(self, o):
+        assert o.linked, o
+        i = _get_count(o.left)
+        while o.parent is not None:
+            p = o.parent
+            if p.right is o:
+                i += _get_count(p.left) + 1
+            o = p
+        return i
+
+    def find(self, x):
+        """Return index of chunk containing x, or the last one"""
+        o = self.__root
+        i = 0
+        while o is not None:
+            n = _get_total(o.left)
+            if x < n:
+                o = o.left
+            elif x < n + len(o):
+                return i + _get_count(o.left)
+            else:
+                x -= n + len(o)
+                i += _get_count(o.left) + 1
+                o = o.right
+        return len(self) - 1
+
+    def iter_from(self, i):
+        stack = []
+        o = self.__root
+        while o is not None:
+            n = _get_count(o.left)
+            if i <= n:
+                stack.append(o)
+                if i == n:
+                    break
+                o = o.left
+            else:
+                i -= n + 1
+                o = o.right
+        while stack:
+            o = stack.pop()
+            yield o
+            o = o.right
+            while o is not None:
+                stack.append(o)
+                o = o.left
+
+    def riter_from(self, i):
+        stack = []
+        o = self.__root
+        while o is not None:
+            n = _get_count(o.left)
+            if i >= n:
+                stack.append(o)
+                if i == n:
+                    break
+                i -= n + 1
+                o = o.right
+            else:
+                o = o.left
+        while stack:
+            o = stack.pop()
+            yield o
+            o = o.left
+            while o is not None:
+                stack.append(o)
+                o = o.right
+
+    def insert(self, i, o):
+        assert not o.linked, o
+        o.parent = o.left = o.right = None
+        o.update()
+        o.linked = True
+        l, r = _split(self.__root, i)
+        self.__set_root(_merge(_merge(l, o), r))
+
+    def append(self, o):
+        self.insert(len(self), o)
+
+    def remove(self, o):
+        i = self.index(o)
+        l, r = _split(self.__root, i)
+        m, r = _split(r, 1)
+        assert m is o, (m, o)
+        self.__set_root(_merge(l, r))
+        o.linked = False
+        o.parent = o.left = o.right = None
+        o.update()
+
+    def __set_root(self, o):
+        if o is not None:
+            o.parent = None
+        self.__root = o
+
+def _get_total(o):
+    if o is not None:
+        return o.total
+    else:
+        return 0
+
+def _get_count(o):
+    if o is not None:
+        return o.count
+    else:
+        return 0
+
+def _split(o, i):
+    """Split o into first i chunks and the rest"""
+    if o is None:
+        return None, None
+    n = _get_count(o.left)
+    if i <= n:
+        l, r = _split(o.left, i)
+        o.left = r
+        o.update()
+        return l, o
+    else:
+        l, r = _split(o.right, i - n - 1)
+        o.right = l
+        o.update()
+        return o, r
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        a.update()
+        return a
+    else:
+        b.left = _merge(a, b.left)
+        b.update()
+        return b
+
+def _build(l):
+    # balanced tree with larger priority on upper levels
+    if not l:
+        return None
+    prio = sorted([_random.random() for o in l], reverse=True)
+    def fn(beg, end, depth):
+        if beg >= end:
+            return None
+        i = (beg + end) // 2
+        o = l[i]
+        o.linked = True
+        o.parent = None
+        o.left = fn(beg, i, depth + 1)
+        o.right = fn(i + 1, end, depth + 1)
+        levels.append((depth, i))
+        return o
+    levels = []
+    root = fn(0, len(l), 0)
+    for j, (depth, i) in enumerate(sorted(levels)):
+        l[i].prio = prio[j]
+    def update(o):
+        if o is not None:
+            update(o.left)
+            update(o.right)
+            o.update()
+    update(root)
+    return root
+
+_random = random.Random()
+
+def alloc_buffer(b):
+    return bytearray(b)
+
+if util.is_python2():
+    def read_buffer(b, x, n):
+        return str(b[x : x + n])
+else:
+    # copy once from memoryview slice
+    def read_buffer(b, x, n):
+        with memoryview(b) as m:
+            return m[x : x + n].tobytes()
@@ -136,6 +136,13 @@ class Console (object):
         global seqno
         refresh()
         seqno += 1
+        # prefetch and build search index while idle,
+        # but don't delay typed input
+        if not self.co.has_input():
+            self.co.start_prefetch()
+        while not self.co.has_input():
+            if self.co.step_match_index(setting.search_index_step_size) == -1:
+                break
         x = self.co.getch()
         if setting.use_trace:
             _log.append(x)
@@ -254,6 +261,12 @@ def cleanup(e, tb):
 def cleanup_no_trace():
     cleanup(None, [])
 
+def has_input():
+    if setting.use_getch:
+        return screen.has_input(_scr)
+    else:
+        return True
+
 def getch():
     if setting.use_getch:
         return _scr.getch()
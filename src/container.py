@@ -147,6 +147,9 @@ class Container (object):
             if self.__cur_workspace.dispatch() == -1:
                 break
 
+    def has_input(self):
+        return len(self.__stream) > 0 or console.has_input()
+
     def getch(self):
         if len(self.__stream):
             x = self.__read_stream()
@@ -166,7 +166,7 @@ def __dispatch(optargs=None):
     parser.add_argument("--command", action="store_true", default=False, help=usage.command)
     parser.add_argument("--sitepkg", action="store_true", default=False, help=usage.sitepkg)
     parser.add_argument("--md", nargs="?", type=str, const="sha256", metavar=usage.md_metavar, help=usage.md)
-    parser.add_argument("--blkcmp", action="store_true", default=False, help=usage.blkcmp)
+    parser.add_argument("--blkcmp", nargs="?", type=str, const="raw", metavar=usage.blkcmp_metavar, help=usage.blkcmp)
     parser.add_argument("--blkdump", nargs="?", type=str, const="text", metavar=usage.blkdump_metavar, help=usage.blkdump)
     parser.add_argument("--blkscan", nargs="?", type=str, const="zero", metavar=usage.blkscan_metavar, help=usage.blkscan)
     if kernel.is_xnix():
@@ -238,8 +238,16 @@ def __dispatch(optargs=None):
             opts.md = "sha256"
         md.md(args, opts.md, opts.verbose)
         return _DID_PRINT_MESSAGE
-    if opts.blkcmp:
-        blkcmp.blkcmp(args, opts.verbose)
+    if opts.blkcmp is not None:
+        # --blkcmp used to take no argument, so take a path as is
+        if not blkcmp.is_cmp_type(opts.blkcmp):
+            f = kernel.parse_file_path(path.get_path(opts.blkcmp))[0]
+            if os.path.exists(f):
+                args.insert(0, opts.blkcmp)
+                opts.blkcmp = "raw"
+        if opts.blkcmp == "":
+            opts.blkcmp = "raw"
+        blkcmp.blkcmp(args, opts.blkcmp, opts.verbose)
         return _DID_PRINT_MESSAGE
     if opts.blkdump is not None:
         if opts.blkdump == "":
@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import io
+import mmap
+import os
+
+from . import kernel
+from . import log
+from . import util
+
+def fopen(f, mode, align):
+    """Return O_DIRECT file if possible, otherwise file with fadvise hints"""
+    if hasattr(os, "O_DIRECT"):
+        if mode == 'r':
+            flags = os.O_RDONLY
+        else:
+            flags = os.O_RDWR
+        try:
+            fd = os.open(f, flags | os.O_DIRECT)
+        except OSError as e: # e.g. EINVAL if unsupported by filesystem
+            log.error("Failed to open {0} with O_DIRECT, {1}".format(f, e))
+        else:
+            return DirectFile(fd, mode, align)
+    return AdvisedFile(kernel.fopen(f, mode))
+
+# read(2) and write(2) using aligned offset, length and buffer,
+# so unaligned requests are converted to read or read-modify-write
+class DirectFile (object):
+    def __init__(self, fd, mode, align):
+        assert align > 0, align
+        if mode == 'r':
+            mode = "rb"
+        else:
+            mode = "r+b"
+        self.__fd = io.FileIO(fd, mode)
+        self.__align = align
+        self.__pos = 0
+        self.__buf = None # page aligned
+
+    def __get_buffer(self, n):
+        if self.__buf is None or len(self.__buf) < n:
+            if self.__buf is not None:
+                self.__buf.close()
+            n = util.roundup(n, kernel.get_page_size())
+            self.__buf = mmap.mmap(-1, n)
+        return self.__buf
+
+    def __get_range(self, n):
+        beg = util.rounddown(self.__pos, self.__align)
+        end = util.roundup(self.__pos + n, self.__align)
+        return beg, end
+
+    def __read_aligned(self, beg, end):
+        buf = memoryview(self.__get_buffer(end - beg))
+        self.__fd.seek(beg)
+        ret = self.__fd.readinto(buf[:end - beg])
+        return buf, ret
+
+    @property
+    def closed(self):
+        return self.__fd.closed
+
+    def fileno(self):
+        return self.__fd.fileno()
+
+    def close(self):
+        self.__fd.close()
+        if self.__buf is not None:
+            self.__buf.close()
+            self.__buf = None
+
+    def flush(self):
+        return
+
+    def seek(self, x, whence=os.SEEK_SET):
+        assert whence == os.SEEK_SET, whence
+        self.__pos = x
+
+    def tell(self):
+        return self.__pos
+
+    def read(self, n):
+        beg, end = self.__get_range(n)
+        buf, ret = self.__read_aligned(beg, end)
+        x = self.__pos - beg
+        b = buf[x : min(x + n, ret)].tobytes()
+        self.__pos += len(b)
+        return b
+
+    def write(self, b):
+        n = len(b)
+        beg, end = self.__get_range(n)
+        x = self.__pos - beg
+        if x or n != end - beg:
+            buf, ret = self.__read_aligned(beg, end)
+            if ret < end - beg: # can't extend
+                raise IOError("Failed to read {0} bytes at {1}".format(
+                    end - beg, beg))
+        else:
+            buf = memoryview(self.__get_buffer(end - beg))
+        buf[x : x + n] = b
+        self.__fd.seek(beg)
+        self.__fd.write(buf[:end - beg])
+        self.__pos += n
+        return n
+
+# page cache is used, but tell kernel not to keep pages of the file
+class AdvisedFile (object):
+    def __init__(self, fd):
+        self.__fd = fd
+        self.__advise(0, 0, "POSIX_FADV_SEQUENTIAL")
+
+    def __getattr__(self, name):
+        if name == "_AdvisedFile__fd":
+            raise AttributeError(name)
+        return getattr(self.__fd, name)
+
+    def __advise(self, offset, length, name):
+        if not hasattr(os, "posix_fadvise"):
+            return
+        try:
+            os.posix_fadvise(self.__fd.fileno(), offset, length,
+                getattr(os, name))
+        except Exception as e:
+            log.debug(e)
+
+    def read(self, n):
+        x = self.__fd.tell()
+        b = self.__fd.read(n)
+        self.__advise(x, len(b), "POSIX_FADV_DONTNEED")
+        return b
@@ -41,6 +41,9 @@ def __iter_env():
     yield "FILEOBJ_USE_TRUNCATE_SHRINK", False
     yield "FILEOBJ_USE_LINE_SCROLL", True
     yield "FILEOBJ_USE_LOWER_CASE_HEX", False
+    yield "FILEOBJ_USE_PREFETCH", False
+    yield "FILEOBJ_USE_DIRECT_IO", False
+    yield "FILEOBJ_USE_MADVISE", True
     yield "FILEOBJ_BUFFER_SIZE", 0
     yield "FILEOBJ_LOGICAL_BLOCK_SIZE", 0
     yield "FILEOBJ_ENDIANNESS", None # :set le,be
@@ -57,6 +60,7 @@ def __iter_env():
     yield "FILEOBJ_COLOR_OFFSET", "none"
     yield "FILEOBJ_DISAS_ARCH", "x86"
     yield "FILEOBJ_DISAS_PRIVATE", None
+    yield "FILEOBJ_WORKER_COUNT", 1
 
 def __iter_env_private():
     yield "__FILEOBJ_USE_DEBUG", False # --debug, unittest (true)
@@ -78,6 +82,7 @@ def __iter_env_private():
     yield "__FILEOBJ_USE_AUTO_FILEOPS_CLEANUP", True # unittest (false)
     yield "__FILEOBJ_USE_FSYNC_CONFIG_FILE", False
     yield "__FILEOBJ_USE_VM_SYNC_ON_EDIT", False
+    yield "__FILEOBJ_USE_BUFFER_LAZY_LOAD", False
     yield "__FILEOBJ_USE_DELETE_CONSOLE", True # unittest (false)
     yield "__FILEOBJ_USE_ALLOW_PYTHON2", False
     yield "__FILEOBJ_USE_WINDOWS_TERMINAL", False
@@ -90,7 +95,23 @@ def __iter_env_private():
     yield "__FILEOBJ_BARRIER_EXTEND", 1024
     yield "__FILEOBJ_REGFILE_SOFT_LIMIT", ((1 << 20) * 100)
     yield "__FILEOBJ_BUFFER_CHUNK_SIZE", -1
-    yield "__FILEOBJ_BUFFER_CHUNK_BALANCE_INTERVAL", 100
+    yield "__FILEOBJ_BUFFER_CHUNK_BALANCE_LIMIT", 8
+    yield "__FILEOBJ_BUFFER_LAZY_CHUNK_SIZE", (1 << 20)
+    yield "__FILEOBJ_BUFFER_LAZY_CACHE_SIZE", 64
+    yield "__FILEOBJ_SEARCH_LOOKBEHIND_SIZE", 1024
+    yield "__FILEOBJ_SEARCH_INDEX_STEP_SIZE", (1 << 20)
+    yield "__FILEOBJ_SEARCH_INDEX_LIMIT", (1 << 20)
+    yield "__FILEOBJ_CMP_READ_SIZE_LIMIT", (1 << 24)
+    yield "__FILEOBJ_READ_AHEAD_BLOCK_SIZE", (1 << 16)
+    yield "__FILEOBJ_READ_AHEAD_SIZE_LIMIT", (1 << 22)
+    yield "__FILEOBJ_READ_AHEAD_CACHE_SIZE", (1 << 24)
+    yield "__FILEOBJ_SYNC_IO_SIZE_LIMIT", (1 << 22)
+    yield "__FILEOBJ_MAP_GAP_SIZE_LIMIT", (1 << 20)
+    yield "__FILEOBJ_MADVISE_SCAN_SIZE", (1 << 22)
+    yield "__FILEOBJ_MAP_WINDOW_SIZE", (1 << 24)
+    yield "__FILEOBJ_MAP_WINDOW_COUNT", 16
+    yield "__FILEOBJ_WORKER_TYPE", "auto"
+    yield "__FILEOBJ_WORKER_STRIPE_SIZE", (1 << 24)
     yield "__FILEOBJ_TERMINAL_HEIGHT", -1
     yield "__FILEOBJ_TERMINAL_WIDTH", -1
     yield "__FILEOBJ_PATH_STREAM", None
@@ -186,6 +207,15 @@ def __get_setting_use_line_scroll():
 def __get_setting_use_lower_case_hex():
     return test_bool("FILEOBJ_USE_LOWER_CASE_HEX")
 
+def __get_setting_use_prefetch():
+    return test_bool("FILEOBJ_USE_PREFETCH")
+
+def __get_setting_use_direct_io():
+    return test_bool("FILEOBJ_USE_DIRECT_IO")
+
+def __get_setting_use_madvise():
+    return test_bool("FILEOBJ_USE_MADVISE")
+
 def __get_setting_buffer_size():
     return test_gt_zero("FILEOBJ_BUFFER_SIZE")
 
@@ -308,6 +338,9 @@ def __get_setting_disas_arch():
 def __get_setting_disas_private():
     return test_name("FILEOBJ_DISAS_PRIVATE")
 
+def __get_setting_worker_count():
+    return test_gt_zero("FILEOBJ_WORKER_COUNT")
+
 def __get_setting_use_debug():
     return test_bool("__FILEOBJ_USE_DEBUG")
 
@@ -365,6 +398,9 @@ def __get_setting_use_fsync_config_file():
 def __get_setting_use_vm_sync_on_edit():
     return test_bool("__FILEOBJ_USE_VM_SYNC_ON_EDIT")
 
+def __get_setting_use_buffer_lazy_load():
+    return test_bool("__FILEOBJ_USE_BUFFER_LAZY_LOAD")
+
 def __get_setting_use_delete_console():
     return test_bool("__FILEOBJ_USE_DELETE_CONSOLE")
 
@@ -412,8 +448,61 @@ def __get_setting_regfile_soft_limit():
 def __get_setting_buffer_chunk_size():
     return test_gt_zero("__FILEOBJ_BUFFER_CHUNK_SIZE")
 
-def __get_setting_buffer_chunk_balance_interval():
-    return test_gt_zero("__FILEOBJ_BUFFER_CHUNK_BALANCE_INTERVAL")
+def __get_setting_buffer_chunk_balance_limit():
+    return test_gt_zero("__FILEOBJ_BUFFER_CHUNK_BALANCE_LIMIT")
+
+def __get_setting_buffer_lazy_chunk_size():
+    return test_gt_zero("__FILEOBJ_BUFFER_LAZY_CHUNK_SIZE")
+
+def __get_setting_buffer_lazy_cache_size():
+    return test_gt_zero("__FILEOBJ_BUFFER_LAZY_CACHE_SIZE")
+
+def __get_setting_search_lookbehind_size():
+    return test_gt_zero("__FILEOBJ_SEARCH_LOOKBEHIND_SIZE")
+
+def __get_setting_search_index_step_size():
+    return test_gt_zero("__FILEOBJ_SEARCH_INDEX_STEP_SIZE")
+
+def __get_setting_search_index_limit():
+    return test_gt_zero("__FILEOBJ_SEARCH_INDEX_LIMIT")
+
+def __get_setting_cmp_read_size_limit():
+    return test_gt_zero("__FILEOBJ_CMP_READ_SIZE_LIMIT")
+
+def __get_setting_read_ahead_block_size():
+    return test_gt_zero("__FILEOBJ_READ_AHEAD_BLOCK_SIZE")
+
+def __get_setting_read_ahead_size_limit():
+    return test_gt_zero("__FILEOBJ_READ_AHEAD_SIZE_LIMIT")
+
+def __get_setting_read_ahead_cache_size():
+    return test_gt_zero("__FILEOBJ_READ_AHEAD_CACHE_SIZE")
+
+def __get_setting_sync_io_size_limit():
+    return test_gt_zero("__FILEOBJ_SYNC_IO_SIZE_LIMIT")
+
+def __get_setting_map_gap_size_limit():
+    return test_gt_zero("__FILEOBJ_MAP_GAP_SIZE_LIMIT")
+
+def __get_setting_madvise_scan_size():
+    return test_gt_zero("__FILEOBJ_MADVISE_SCAN_SIZE")
+
+def __get_setting_map_window_size():
+    return test_gt_zero("__FILEOBJ_MAP_WINDOW_SIZE")
+
+def __get_setting_map_window_count():
+    return test_gt_zero("__FILEOBJ_MAP_WINDOW_COUNT")
+
+def __get_setting_worker_type():
+    s = "__FILEOBJ_WORKER_TYPE"
+    ret = test_name(s).lower()
+    if ret in ("auto", "thread", "process"):
+        return ret
+    else:
+        return get_default(s)
+
+def __get_setting_worker_stripe_size():
+    return test_gt_zero("__FILEOBJ_WORKER_STRIPE_SIZE")
 
 def __get_setting_terminal_height():
     return test_gt_zero("__FILEOBJ_TERMINAL_HEIGHT")
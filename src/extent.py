@@ -0,0 +1,116 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import bisect
+
+from . import util
+
+# Sorted extents of modified bytes, where each extent is a bytearray.
+# Overlapping or adjacent extents are coalesced on replace, so extents
+# never touch each other, and lookup is O(log extents).
+class ExtentMap (object):
+    def __init__(self):
+        self.__offs = [] # sorted offsets
+        self.__bufs = [] # bytearray per offset
+
+    def __len__(self):
+        return len(self.__offs)
+
+    def __str__(self):
+        return "extent total {0} size {1}".format(len(self),
+            util.get_size_repr(self.get_size()))
+
+    def get_size(self):
+        return sum(len(b) for b in self.__bufs)
+
+    def clear(self):
+        self.__offs = []
+        self.__bufs = []
+
+    def iter_extent(self):
+        for i, x in enumerate(self.__offs):
+            yield x, self.__bufs[i]
+
+    def has_extent(self, beg, end):
+        """Return True if any extent overlaps [beg, end)"""
+        i = self.__get_index(beg)
+        return i < len(self) and self.__offs[i] < end
+
+    def __get_index(self, x):
+        # index of the first extent which ends after x
+        i = bisect.bisect_right(self.__offs, x) - 1
+        if i < 0 or self.__offs[i] + len(self.__bufs[i]) <= x:
+            i += 1
+        return i
+
+    def replace(self, x, b):
+        n = len(b)
+        if not n:
+            return
+        # extents overlapping or adjacent to [x, x+n) are merged into one
+        i = bisect.bisect_right(self.__offs, x) - 1
+        if i < 0 or self.__offs[i] + len(self.__bufs[i]) < x:
+            i += 1
+        j = i
+        while j < len(self) and self.__offs[j] <= x + n:
+            j += 1
+        if i < j and self.__offs[i] <= x:
+            beg = self.__offs[i]
+            buf = self.__bufs[i]
+            k = i + 1
+        else:
+            beg = x
+            buf = bytearray()
+            k = i
+        for l in util.get_xrange(k, j):
+            d = self.__offs[l] - beg
+            if len(buf) < d:
+                buf.extend(bytearray(d - len(buf))) # filled by b below
+            buf[d : d + len(self.__bufs[l])] = self.__bufs[l]
+        d = x - beg
+        buf[d : d + n] = b
+        self.__offs[i:j] = [beg]
+        self.__bufs[i:j] = [buf]
+
+    def read(self, x, b):
+        """Return b read at x with extents applied"""
+        n = len(b)
+        i = self.__get_index(x)
+        if i >= len(self) or self.__offs[i] >= x + n:
+            return b
+        ret = bytearray(b)
+        while i < len(self) and self.__offs[i] < x + n:
+            off = self.__offs[i]
+            buf = self.__bufs[i]
+            beg = max(off, x)
+            end = min(off + len(buf), x + n)
+            ret[beg - x : end - x] = buf[beg - off : end - off]
+            i += 1
+        return _to_bytes(ret)
+
+if util.is_python2():
+    def _to_bytes(b):
+        return str(b)
+else:
+    def _to_bytes(b):
+        return bytes(b)
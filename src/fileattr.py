@@ -49,6 +49,7 @@ def alloc():
         offset = 0,
         length = 0,
         word = util.str_to_bytes(''),
+        index = None,
         marks = {},
         session = {},
         undo = undo.Undo())
@@ -21,6 +21,8 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import binascii
+
 from . import util
 
 _ = util.str_to_bytes
@@ -67,6 +69,16 @@ def __riter_3k(b):
     for i in reversed(range(len(b))):
         yield b[i : i + 1]
 
+def __xor_2k(a, b):
+    if not a:
+        return BLANK
+    x = int(binascii.hexlify(a), 16) ^ int(binascii.hexlify(b), 16)
+    return binascii.unhexlify("{0:0{1}x}".format(x, len(a) * 2))
+
+def __xor_3k(a, b):
+    x = int.from_bytes(a, "big") ^ int.from_bytes(b, "big")
+    return x.to_bytes(len(a), "big")
+
 def __split_2k(b):
     return list(b)
 
@@ -119,6 +131,7 @@ if util.is_python2():
     iter = __iter_2k
     riter = __riter_2k
     split = __split_2k
+    xor = __xor_2k
     str = __str_2k
 else:
     TYPE = bytes
@@ -132,4 +145,5 @@ else:
     iter = __iter_3k
     riter = __riter_3k
     split = __split_3k
+    xor = __xor_3k
     str = __str_3k
@@ -40,6 +40,7 @@ from . import util
 #     romap.Fileobj
 #         rrmap.Fileobj
 #             rwmap.Fileobj
+#     rowmap.Fileobj
 #     robuf.Fileobj
 #         roext.Fileobj
 #         rovm.Fileobj
@@ -47,6 +48,7 @@ from . import util
 #             rrvm.Fileobj
 #             rwbuf.Fileobj
 #                 rwext.Fileobj
+#             rwpiece.Fileobj
 #     rofd.Fileobj
 #         roblk.Fileobj
 #         rwfd.Fileobj
@@ -178,6 +180,15 @@ class Fileobj (object):
     def get_sector_size(self):
         return -1
 
+    def get_fileno(self):
+        return -1 # no file descriptor to read from
+
+    def get_hole_map(self):
+        return None # no hole, or unknown
+
+    def start_prefetch(self):
+        return
+
     def get_id(self):
         return self.__id
 
@@ -311,16 +322,29 @@ class Fileobj (object):
         return self.__attr.word
 
     def set_search_word(self, s):
-        assert isinstance(s, filebytes.TYPE), (s, type(s))
+        assert isinstance(s, filebytes.TYPE) or hasattr(s, "iter_match"), \
+            (s, type(s))
         self.__attr.word = s
 
+    def get_match_index(self):
+        return self.__attr.index
+
+    def set_match_index(self, o):
+        self.__attr.index = o
+
     def search(self, x, s, end=-1):
         self.set_search_word(s)
-        return self.find(x, s, end)
+        if isinstance(s, filebytes.TYPE):
+            return self.find(x, s, end)
+        else: # search.Pattern
+            return s.find(self, x, end)
 
     def rsearch(self, x, s, end=-1):
         self.set_search_word(s)
-        return self.rfind(x, s, end)
+        if isinstance(s, filebytes.TYPE):
+            return self.rfind(x, s, end)
+        else: # search.Pattern
+            return s.rfind(self, x, end)
 
     def iter_search(self, x, word):
         while True:
@@ -28,6 +28,7 @@ from . import allocator
 from . import filebytes
 from . import fileobj
 from . import path
+from . import search
 from . import setting
 from . import util
 
@@ -121,6 +122,24 @@ class Fileops (object):
     def get_sector_size(self):
         return self.__ref.get_sector_size()
 
+    def is_hole(self, x, n):
+        o = self.__get_hole_map()
+        if o:
+            return o.is_hole(x, n)
+        return False
+
+    def get_next_data(self, x):
+        o = self.__get_hole_map()
+        if o:
+            return o.get_next_data(x)
+        return x
+
+    def __get_hole_map(self):
+        # offsets are shifted by barrier
+        if self.__ref.is_barrier_active():
+            return None
+        return self.__ref.get_hole_map()
+
     def get_id(self):
         return self.__ref.get_id()
 
@@ -242,11 +261,47 @@ class Fileops (object):
         self.__ref.set_search_word(s)
 
     def search(self, x, word, end=-1):
+        o = self.__get_match_index(word)
+        if o is not None and o.is_complete():
+            self.__ref.set_search_word(word)
+            return o.find(x, end)
         return self.__ref.search(x, word, end)
 
     def rsearch(self, x, word, end=-1):
+        o = self.__get_match_index(word)
+        if o is not None and o.is_complete():
+            self.__ref.set_search_word(word)
+            return o.rfind(x, end)
         return self.__ref.rsearch(x, word, end)
 
+    def get_match_index(self):
+        return self.__ref.get_match_index()
+
+    def __get_match_index(self, word):
+        if self.is_vm(): # may change without edit
+            return None
+        o = self.__ref.get_match_index()
+        if o is None or not o.test_word(word):
+            o = search.MatchIndex(word, self.get_size())
+            self.__ref.set_match_index(o)
+        return o
+
+    def step_match_index(self, n):
+        o = self.__ref.get_match_index()
+        if o is None:
+            return -1
+        return o.step(self.__ref, n)
+
+    def __update_match_index(self, name, *l):
+        o = self.__ref.get_match_index()
+        if o is not None:
+            getattr(o, name)(*l)
+
+    def __reset_match_index(self):
+        o = self.__ref.get_match_index()
+        if o is not None:
+            o.reset(self.get_size())
+
     def iter_search(self, x, word):
         return self.__ref.iter_search(self.__get_normalized_pos(x), word)
 
@@ -254,7 +309,9 @@ class Fileops (object):
         return self.__ref.iter_rsearch(self.__get_normalized_pos(x), word)
 
     def init_buffer(self, b):
-        return self.__ref.init_buffer(b)
+        ret = self.__ref.init_buffer(b)
+        self.__reset_match_index()
+        return ret
 
     def __init_ops(self):
         if setting.use_debug:
@@ -391,12 +448,14 @@ class Fileops (object):
             self.__ref.barrier_insert(x, l, rec)
         else:
             self.__ref.insert(x, l, rec)
+            self.__update_match_index("insert", x, len(l))
 
     def __replace(self, x, l, rec=True):
         if self.__ref.is_barrier_active():
             self.__ref.barrier_replace(x, l, rec)
         else:
             self.__ref.replace(x, l, rec)
+            self.__update_match_index("replace", x, len(l))
 
     def __delete(self, x, n, rec=True):
         if x + n > self.get_size():
@@ -407,6 +466,7 @@ class Fileops (object):
             self.__ref.barrier_delete(x, n, rec)
         else:
             self.__ref.delete(x, n, rec)
+            self.__update_match_index("delete", x, n)
         if self.get_pos() > self.get_max_pos():
             self.set_pos(self.get_max_pos())
 
@@ -417,6 +477,7 @@ class Fileops (object):
             self.__ref.barrier_truncate(n, rec)
         else:
             self.__ref.truncate(n, rec)
+            self.__reset_match_index()
         if self.get_pos() > self.get_max_pos():
             self.set_pos(self.get_max_pos())
 
@@ -444,18 +505,22 @@ class Fileops (object):
 
     def undo(self, n=1):
         ret = self.__ref.undo(n)
+        self.__reset_match_index()
         if self.get_pos() > self.get_max_pos(): # delete on undo
             self.set_pos(self.get_max_pos())
         return ret
 
     def redo(self, n=1):
         ret = self.__ref.redo(n)
+        self.__reset_match_index()
         if self.get_pos() > self.get_max_pos(): # delete on redo
             self.set_pos(self.get_max_pos())
         return ret
 
     def rollback(self, n=1):
-        return self.__ref.rollback(n)
+        ret = self.__ref.rollback(n)
+        self.__reset_match_index()
+        return ret
 
     def rollback_until(self, to):
         """Rollback until # of remaining undos is arg to"""
@@ -570,6 +635,24 @@ class ConcatenatedFileops (object):
     def get_type(self):
         return tuple(ops.get_type() for ops in self.__opsl)
 
+    def is_blk(self):
+        return any(ops.is_blk() for ops in self.__opsl)
+
+    def iter_fileops(self):
+        for ops in self.__opsl:
+            yield ops
+
+    def is_hole(self, x, n):
+        ops_base = 0
+        for ops in self.__opsl:
+            ops_size = ops.get_size()
+            if x < ops_base + ops_size:
+                if x + n > ops_base + ops_size:
+                    return False # not within a single file
+                return ops.is_hole(x - ops_base, n)
+            ops_base += ops_size
+        return False
+
     def read(self, x, n):
         read_next = False
         ops_base = 0
@@ -597,7 +680,7 @@ def is_concatenated(ops):
 
 def __alloc_concatenated_fileops(opsl, printf):
     ops = ConcatenatedFileops(opsl)
-    if setting.use_debug:
+    if setting.use_debug and printf:
         __debug_print_fileops(ops, printf)
     return ops
 
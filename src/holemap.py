@@ -0,0 +1,91 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+
+from . import kernel
+from . import log
+
+class HoleMap (object):
+    def __init__(self, f, offset, size):
+        self.__path = f
+        self.__fileno = -1 # own fd, file offset of others is not shared
+        self.__offset = offset # mapping offset
+        self.__size = size
+        self.__hole = 0, 0 # last found hole [beg, end) in absolute offset
+        self.__data = 0, 0 # last found data [beg, end) in absolute offset
+        self.__enabled = True
+
+    def __str__(self):
+        return "hole {0}-{1} data {2}-{3}".format(self.__hole[0],
+            self.__hole[1], self.__data[0], self.__data[1])
+
+    def cleanup(self):
+        if self.__fileno != -1:
+            os.close(self.__fileno)
+            self.__fileno = -1
+
+    def is_hole(self, x, n):
+        """Return True if [x, x+n) has no data"""
+        if not self.__enabled or n <= 0:
+            return False
+        beg = self.__offset + x
+        end = beg + n
+        if not self.__in_hole(beg, end) and not self.__in_data(beg):
+            self.__update(beg)
+        return self.__in_hole(beg, end)
+
+    def get_next_data(self, x):
+        """Return offset of next data at or after x, or -1 if none"""
+        if not self.is_hole(x, 1):
+            return x
+        end = self.__hole[1]
+        if end >= self.__offset + self.__size:
+            return -1
+        return end - self.__offset
+
+    def __in_hole(self, beg, end):
+        return self.__hole[0] <= beg and end <= self.__hole[1]
+
+    def __in_data(self, beg):
+        return self.__data[0] <= beg < self.__data[1]
+
+    def __update(self, beg):
+        eof = self.__offset + self.__size
+        try:
+            if self.__fileno == -1:
+                self.__fileno = os.open(self.__path, os.O_RDONLY)
+            x = kernel.seek_data(self.__fileno, beg)
+            if x == -1 or x >= eof:
+                self.__hole = beg, eof
+            elif x > beg:
+                self.__hole = beg, x
+            else:
+                x = kernel.seek_hole(self.__fileno, beg)
+                if x == -1 or x > eof:
+                    x = eof
+                self.__data = beg, x
+        except Exception as e:
+            # e.g. not supported by filesystem, assume no holes
+            log.debug(e)
+            self.__enabled = False
@@ -21,9 +21,16 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import errno
+import mmap
 import os
 import re
 
+try:
+    import resource as _resource
+except ImportError: # Windows
+    _resource = None
+
 from . import filebytes
 from . import log
 from . import native
@@ -368,6 +375,90 @@ def is_blkdev_supported():
     else:
         return False
 
+def has_seek_hole():
+    """Return True if lseek(2) supports SEEK_DATA and SEEK_HOLE"""
+    return hasattr(os, "SEEK_DATA") and hasattr(os, "SEEK_HOLE")
+
+def seek_data(fileno, offset):
+    """Return offset of next data at or after offset, or -1 if none"""
+    return __seek_hole(fileno, offset, os.SEEK_DATA)
+
+def seek_hole(fileno, offset):
+    """Return offset of next hole at or after offset, or -1 if none"""
+    return __seek_hole(fileno, offset, os.SEEK_HOLE)
+
+def __seek_hole(fileno, offset, whence):
+    # moves file offset, fileno must not be shared with file object
+    try:
+        return os.lseek(fileno, offset, whence)
+    except OSError as e:
+        if e.errno == errno.ENXIO: # offset beyond last data
+            return -1
+        raise
+
+def has_pwritev():
+    """Return True if pwritev(2) is supported"""
+    return hasattr(os, "pwritev")
+
+def pwritev(fileno, bufs, offset):
+    """Write buffers at offset, return number of pwritev(2) calls"""
+    iov_max = __get_iov_max()
+    bufs = [memoryview(b) for b in bufs]
+    i = 0
+    ret = 0
+    while i < len(bufs):
+        n = os.pwritev(fileno, bufs[i : i + iov_max], offset)
+        if n <= 0:
+            raise IOError("Failed to write {0} buffers at {1}".format(
+                len(bufs) - i, offset))
+        ret += 1
+        offset += n
+        while n: # skip written buffers, may be partial
+            if n >= len(bufs[i]):
+                n -= len(bufs[i])
+                i += 1
+            else:
+                bufs[i] = bufs[i][n:]
+                n = 0
+    return ret
+
+def __get_iov_max():
+    try:
+        ret = os.sysconf("SC_IOV_MAX")
+    except Exception:
+        ret = -1
+    if ret <= 0:
+        ret = 16 # _XOPEN_IOV_MAX
+    return ret
+
+def has_madvise():
+    """Return True if madvise(2) is supported"""
+    return hasattr(mmap.mmap, "madvise")
+
+def madvise(m, name, offset, length):
+    """Call madvise(2) with page aligned range of mapping m if supported"""
+    advice = getattr(mmap, name, None)
+    if advice is None or not has_madvise():
+        return -1
+    page_size = get_page_size()
+    beg = max(util.rounddown(offset, page_size), 0)
+    end = min(offset + length, len(m))
+    if beg >= end:
+        return -1
+    try:
+        m.madvise(advice, beg, end - beg)
+    except Exception as e: # e.g. EINVAL if unsupported by kernel
+        log.debug(e)
+        return -1
+
+def get_fault_count():
+    """Return minor and major page fault count of this process"""
+    if _resource:
+        ru = _resource.getrusage(_resource.RUSAGE_SELF)
+        return ru.ru_minflt, ru.ru_majflt
+    else:
+        return -1, -1
+
 def mmap_full(fileno, readonly=False):
     o = get_kernel_module()
     if o:
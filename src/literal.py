@@ -470,6 +470,7 @@ def init():
     setattr(this, "s_version", SlowLiteral(":version", None, "Print version"))
     setattr(this, "s_argv", SlowLiteral(":argv", None, "Print arguments of this program"))
     setattr(this, "s_args", SlowLiteral(":args", None, "Print buffer list with the current buffer in brackets"))
+    setattr(this, "s_matches", SlowLiteral(":matches", None, "Print the number of matches of the latest search and the offsets from the current position"))
     setattr(this, "s_md5", SlowLiteral(":md5", None, "Print md5 message digest of the current buffer"))
     setattr(this, "s_sha1", SlowLiteral(":sha1", None, "Print sha1 message digest of the current buffer"))
     setattr(this, "s_sha224", SlowLiteral(":sha224", None, "Print sha224 message digest of the current buffer"))
@@ -0,0 +1,193 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import with_statement
+import json
+import os
+
+from . import filebytes
+from . import kernel
+from . import setting
+from . import util
+
+# first line of a manifest file, followed by json
+_MAGIC = "fileobj-manifest"
+_VERSION = 1
+
+class Error (util.GenericError):
+    pass
+
+class Manifest (object):
+    def __init__(self, f, offset, size, mtime, inode, block_size, hash_algo):
+        self.path = f
+        self.offset = offset # mapping offset
+        self.size = size
+        self.mtime = mtime
+        self.inode = inode
+        self.block_size = block_size
+        self.hash_algo = hash_algo
+        self.digest = None # whole file
+        self.blocks = [None] * util.howmany(size, block_size) # None if invalid
+        self.base = None # blocks of previous manifest, not saved
+        self.read_count = 0
+        self.changed_count = 0
+
+    def __str__(self):
+        return "{0} {1}@{2}:{3} {4}/{5} blocks read {6} changed {7}".format(
+            self.hash_algo, self.path, self.offset, self.size,
+            self.get_valid_count(), len(self.blocks), self.read_count,
+            self.changed_count)
+
+    def get_valid_count(self):
+        return len(self.blocks) - self.blocks.count(None)
+
+    def test(self, o):
+        return self.test_layout(o) and \
+            self.size == o.size and \
+            self.mtime == o.mtime and \
+            self.inode == o.inode
+
+    def test_layout(self, o):
+        # blocks are comparable, but not necessarily valid
+        return self.path == o.path and \
+            self.offset == o.offset and \
+            self.block_size == o.block_size and \
+            self.hash_algo == o.hash_algo
+
+def get_path(f):
+    # e.g. ~/.fileobj/manifest/%dev%sda
+    s = os.path.abspath(f).replace(os.sep, "%")
+    return os.path.join(setting.get_manifest_dir(), s)
+
+def is_manifest(f):
+    if not os.path.isfile(f):
+        return False
+    try:
+        with kernel.fopen_text(f) as fd:
+            return fd.readline().split() == [_MAGIC, str(_VERSION)]
+    except Exception:
+        return False
+
+def load(f):
+    with kernel.fopen_text(f) as fd:
+        l = fd.readline().split()
+        if l != [_MAGIC, str(_VERSION)]:
+            raise Error("Invalid manifest {0}".format(f))
+        d = json.load(fd)
+    assert isinstance(d, dict), d
+    o = Manifest(util.unicode_to_str(d["path"]), d["offset"], d["size"],
+        d["mtime"], d["inode"], d["block_size"],
+        util.unicode_to_str(d["hash_algo"]))
+    if d["digest"] is not None:
+        o.digest = util.unicode_to_str(d["digest"])
+    l = d["blocks"]
+    if len(l) != len(o.blocks):
+        raise Error("Invalid manifest {0}, {1} blocks for size {2}".format(f,
+            len(l), o.size))
+    o.blocks = [util.unicode_to_str(x) if x is not None else None for x in l]
+    return o
+
+def save(o, f=None):
+    if f is None:
+        f = get_path(o.path)
+    d = os.path.dirname(f)
+    if not os.path.isdir(d):
+        try:
+            os.makedirs(d)
+        except OSError:
+            if not os.path.isdir(d): # may be created by other thread
+                raise
+    if setting.use_fsync_config_file:
+        fsync = kernel.fsync
+    else:
+        fsync = None
+    with util.do_atomic_write(f, binary=False, fsync=fsync) as fd:
+        fd.write("{0} {1}\n".format(_MAGIC, _VERSION))
+        json.dump(dict(
+            path=o.path,
+            offset=o.offset,
+            size=o.size,
+            mtime=o.mtime,
+            inode=o.inode,
+            block_size=o.block_size,
+            hash_algo=o.hash_algo,
+            digest=o.digest,
+            blocks=o.blocks), fd)
+
+def get(ops, block_size, hash_algo):
+    # saved manifest for ops if still valid, otherwise a new one
+    f = ops.get_path()
+    o = Manifest(f, ops.get_mapping_offset(), ops.get_size(),
+        os.stat(f).st_mtime, kernel.get_inode(f), block_size, hash_algo)
+    mf = get_path(f)
+    if not os.path.isfile(mf):
+        return o
+    try:
+        old = load(mf)
+    except Exception:
+        return o
+    # mtime of a block device doesn't change on write
+    if old.test(o) and not ops.is_blk():
+        return old
+    # entries can't be trusted, but count blocks changed since then
+    if old.test_layout(o):
+        o.base = old.blocks
+    return o
+
+def update(ops, o, need_digest):
+    # read blocks with invalid entries, or all if whole file digest needed,
+    # but not holes which are known to be zero without reading
+    if need_digest and o.digest is None:
+        m = util.get_hash_object(o.hash_algo)
+    else:
+        m = None
+    zero = filebytes.ZERO * o.block_size
+    zero_digest = None
+    try:
+        for i, x in enumerate(o.blocks):
+            if x is not None and m is None:
+                continue
+            offset = i * o.block_size
+            if ops.is_hole(offset, o.block_size):
+                # no need to read or hash the block again
+                if zero_digest is None:
+                    zero_digest = util.get_hash_string(o.hash_algo, zero)
+                if m:
+                    m = util.update_hash_object(m, zero)
+                __set_block(o, i, zero_digest)
+                continue
+            buf = ops.read(offset, o.block_size)
+            o.read_count += 1
+            if m:
+                m = util.update_hash_object(m, buf)
+            __set_block(o, i, util.get_hash_string(o.hash_algo, buf))
+        if m:
+            o.digest = m.hexdigest()
+    finally:
+        save(o) # keep progress if interrupted
+
+def __set_block(o, i, x):
+    if o.base is not None:
+        if i >= len(o.base) or o.base[i] != x:
+            o.changed_count += 1
+    o.blocks[i] = x
@@ -22,9 +22,13 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import threading
 
+from . import filebytes
 from . import fileops
+from . import manifest
 from . import util
+from . import worker
 
 def md(args, hash_algo, verbose):
     try:
@@ -43,25 +47,33 @@ def _md(args, s, verbose, printf, printe):
         printe("Not enough paths {0}".format(args))
         return -1
 
-    # extract option string
-    s = s.lower()
-    if "," in s:
-        l = s.split(",")
-        hash_algo = l[0]
-        if hash_algo == "":
-            hash_algo = "sha256"
-        opt = l[1]
-    else:
-        hash_algo = s
-        opt = ""
-
-    # test if hash_algo exists
-    m = util.get_hash_object(hash_algo)
-    if m is None:
-        printe("No such hash algorithm \"{0}\", "
-            "supported hash algorithms are as follows".format(hash_algo))
-        printe("{0}".format(" ".join(util.get_available_hash_algorithms())))
-        return -1
+    # extract option string, e.g. "sha256,md5,sort"
+    hash_algos = []
+    optl = []
+    for x in s.lower().split(","):
+        if x in ("get", "sort", "manifest"):
+            optl.append(x)
+        elif x and x not in hash_algos:
+            hash_algos.append(x)
+    if not hash_algos:
+        hash_algos.append("sha256")
+    use_manifest = "manifest" in optl
+    if use_manifest:
+        optl.remove("manifest")
+        if len(hash_algos) > 1:
+            printe("Manifest requires single hash algorithm")
+            return -1
+    opt = optl[0] if optl else ""
+
+    # test if hash_algos exist
+    for hash_algo in hash_algos:
+        m = util.get_hash_object(hash_algo)
+        if m is None:
+            printe("No such hash algorithm \"{0}\", "
+                "supported hash algorithms are as follows".format(hash_algo))
+            printe("{0}".format(" ".join(
+                util.get_available_hash_algorithms())))
+            return -1
 
     # define callback
     if opt == "get":
@@ -89,45 +101,125 @@ def _md(args, s, verbose, printf, printe):
         for x in util.get_available_hash_algorithms():
             if " " in x:
                 x = "'{0}'".format(x)
-            if x == hash_algo:
+            if x in hash_algos:
                 x = "[{0}]".format(x)
             l.append(x)
         printf(" ".join(l))
 
+    if use_manifest:
+        pfn = process_md_manifest
+    else:
+        pfn = process_md
+    def pfn_(f):
+        return pfn(f, hash_algos, printf, printe)
+
     # walk if args contains directory
-    for x in args:
-        if os.path.isdir(x):
-            for f in util.iter_directory(x):
-                l = process_md(f, hash_algo, fn, printf, printe)
+    def g():
+        for x in args:
+            if os.path.isdir(x):
+                for f in util.iter_directory(x):
+                    yield f
+            else:
+                yield x
+
+    # hashlib releases GIL, so files are hashed concurrently on threads,
+    # and imap keeps the order of results
+    if worker.is_parallel():
+        pool = worker.alloc_pool(False)
+        try:
+            for l in pool.imap(pfn_, g()):
                 if l == -1:
                     return -1
-        else:
-            l = process_md(x, hash_algo, fn, printf, printe)
+                fn(l)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        for f in g():
+            l = pfn_(f)
             if l == -1:
                 return -1
+            fn(l)
     return retfn()
 
-def process_md(f, hash_algo, fn, printf, printe):
-    opsl, cleanup, blksiz, = fileops.bulk_alloc_blk((f,), True, printf, printe)
+def __alloc_fileops(f, printf, printe):
+    # setting.allow_dup_path is shared by threads
+    with _lock:
+        return fileops.bulk_alloc_blk((f,), True, printf, printe)
+
+def __cleanup_fileops(cleanup):
+    with _lock:
+        cleanup()
+
+def process_md(f, hash_algos, printf, printe):
+    opsl, cleanup, blksiz, = __alloc_fileops(f, printf, printe)
     if opsl is None:
         return -1
     assert len(opsl) == 1, opsl
     ops = opsl[0]
 
+    # single read pass for all hash algorithms
     resid = ops.get_size()
     offset = 0
-    m = util.get_hash_object(hash_algo)
+    ml = [util.get_hash_object(x) for x in hash_algos]
+    zero = filebytes.ZERO * blksiz
     while resid > 0:
-        buf = ops.read(offset, blksiz)
+        if ops.is_hole(offset, blksiz):
+            buf = zero # no need to read
+        else:
+            buf = ops.read(offset, blksiz)
         if not buf:
             break
-        m = util.update_hash_object(m, buf)
+        for m in ml:
+            util.update_hash_object(m, buf)
         resid -= len(buf)
         offset += len(buf)
 
-    fn((ops.get_path(), m.hexdigest()))
-    cleanup()
+    l = [ops.get_path()]
+    l.extend([m.hexdigest() for m in ml])
+    __cleanup_fileops(cleanup)
+    return tuple(l)
+
+def process_md_manifest(f, hash_algos, printf, printe):
+    assert len(hash_algos) == 1, hash_algos
+    hash_algo = hash_algos[0]
+
+    # saved manifest instead of the original file
+    if manifest.is_manifest(f):
+        try:
+            o = manifest.load(f)
+        except Exception as e:
+            printe(e)
+            return -1
+        if o.hash_algo != hash_algo:
+            printe("Hash algorithm mismatch \"{0}\" for {1}".format(
+                o.hash_algo, f))
+            return -1
+        if o.digest is None:
+            printe("No message digest in {0}".format(f))
+            return -1
+        return o.path, o.digest
+
+    opsl, cleanup, blksiz, = __alloc_fileops(f, printf, printe)
+    if opsl is None:
+        return -1
+    assert len(opsl) == 1, opsl
+    ops = opsl[0]
+
+    try:
+        o = manifest.get(ops, blksiz, hash_algo)
+        manifest.update(ops, o, True)
+    except Exception as e:
+        printe(e)
+        __cleanup_fileops(cleanup)
+        return -1
+
+    l = ops.get_path(), o.digest
+    __cleanup_fileops(cleanup)
+    return l
 
 def print_md(l, printf):
     fmt = "{0}  {1}" # shaXsum compatible, but with abs path
-    printf(fmt.format(l[1], l[0]))
+    printf(fmt.format("  ".join(l[1:]), l[0]))
+
+_lock = threading.Lock()
@@ -24,6 +24,7 @@
 from __future__ import division
 from __future__ import with_statement
 import base64
+import bisect
 import os
 import platform
 import sys
@@ -39,6 +40,7 @@ from . import native
 from . import panel
 from . import path
 from . import screen
+from . import search
 from . import setting
 from . import terminal
 from . import util
@@ -488,19 +490,30 @@ def __cursor_next_matched_block(self, cnt, fn, n):
 
 def __cursor_next_matched_block_goto(self, pos, end, cnt, fn, n):
     assert end % n == 0, end
+    hole = fn(filebytes.ZERO * n) # holes are read as zero
     while True:
         assert pos % n == 0, pos
         if pos > end:
             return -1, cnt
-        b = self.co.read(pos, n)
-        if len(b) < n:
-            return -1, cnt
-        if fn(b):
+        if self.co.is_hole(pos, n):
+            if not hole: # skip to block of next data
+                x = self.co.get_next_data(pos)
+                if x == -1:
+                    return -1, cnt
+                pos = max(pos + n, util.align_head(x, n))
+                continue
+            matched = True
+        else:
+            b = self.co.read(pos, n)
+            if len(b) < n:
+                return -1, cnt
+            matched = fn(b)
+        if matched:
             cnt -= 1
             if not cnt:
                 go_to(self, pos)
                 return None, None
-        pos += len(b)
+        pos += n
         if screen.test_signal():
             self.co.flash("Search interrupted")
             return None, None
@@ -521,13 +534,18 @@ def __cursor_prev_matched_block(self, cnt, fn, n):
 
 def __cursor_prev_matched_block_goto(self, pos, end, cnt, fn, n):
     assert end % n == 0, end
+    hole = fn(filebytes.ZERO * n) # holes are read as zero
     while True:
         assert pos % n == 0, pos
         if pos < end:
             return -1, cnt
-        b = self.co.read(pos, n)
-        # len(b) < n can happen at last page of unaligned size buffer
-        if len(b) == n and fn(b):
+        if self.co.is_hole(pos, n):
+            matched = hole
+        else:
+            b = self.co.read(pos, n)
+            # len(b) < n can happen at last page of unaligned size buffer
+            matched = len(b) == n and fn(b)
+        if matched:
             cnt -= 1
             if not cnt:
                 go_to(self, pos)
@@ -1177,6 +1195,36 @@ def show_args(self, amp, opc, args, raw):
     l[l.index(x)] = "[{0}]".format(x)
     self.co.show(' '.join(l))
 
+def show_matches(self, amp, opc, args, raw):
+    o = self.co.get_match_index()
+    if o is None or not o.test_word(self.co.get_search_word()):
+        self.co.flash("No previous search")
+        return
+    while self.co.step_match_index(setting.search_index_step_size) != -1:
+        if screen.test_signal():
+            self.co.flash("Interrupted")
+            return
+    if o.overflow:
+        self.co.flash("More than {0} matches".format(len(o)))
+        return
+    if not len(o):
+        self.co.show("0 matches")
+        return
+    pos = self.co.get_pos()
+    i = bisect.bisect_left(o.array, pos)
+    if i == len(o):
+        i = 0 # wrap
+    fmt = util.get_offset_format(self.co.get_size())
+    l = ["[{0}/{1}]".format(i + 1, len(o))]
+    n = len(l[0])
+    for x in o.array[i:]:
+        t = fmt.format(x)
+        n += len(t) + 1
+        if n >= screen.get_size_x():
+            break
+        l.append(t)
+    self.co.show(' '.join(l))
+
 def __show_hash(self, efn):
     try:
         buf = self.co.readall()
@@ -1245,25 +1293,20 @@ def __cmp_buffer(self, pos, fn):
     beg = pos
     siz = kernel.get_buffer_size()
 
-    # XXX too slow
     while True:
         bufs, is_equal = __cmp_buffer_read(self, pos, siz)
         if bufs is None:
             break
-        if find_equal and is_equal: # short cut
-            __cmp_buffer_goto(self, pos)
-            return
-        l = [len(b) for b in bufs]
-        for x in util.get_xrange(min(l)):
-            for i in util.get_xrange(len(bufs)):
-                if i == 0:
-                    continue
-                a = bufs[i - 1]
-                b = bufs[i]
-                if fn(a[x], b[x]):
-                    __cmp_buffer_goto(self, pos + x)
-                    return
-        if len(set(l)) != 1: # end of either of the buffers
+        if is_equal:
+            if find_equal: # short cut
+                __cmp_buffer_goto(self, pos)
+                return
+        else:
+            x = __cmp_buffer_find(bufs, find_equal, False)
+            if x != -1:
+                __cmp_buffer_goto(self, pos + x)
+                return
+        if len(set([len(b) for b in bufs])) != 1: # end of either of the buffers
             break
         pos += siz
         if pos > max_pos:
@@ -1271,6 +1314,7 @@ def __cmp_buffer(self, pos, fn):
         if screen.test_signal():
             self.co.flash("Forward cmp interrupted")
             return
+        siz = __cmp_buffer_next_size(siz)
     if beg == 0: # can only tell if started from offset 0
         if find_equal:
             self.co.show("Buffers have nothing in common")
@@ -1294,40 +1338,28 @@ def __cmpr_buffer(self, pos, fn):
     find_equal = __cmp_to_find_equal(self, fn)
     beg = pos
     siz = kernel.get_buffer_size()
-    pos -= siz
-    pos += 1 # max pos is (size - 1), so plus 1
-    if pos < 0:
-        siz += pos
-        pos = 0
+    end = pos + 1 # max pos is (size - 1), so plus 1
 
-    # XXX too slow
-    while True:
-        bufs, is_equal = __cmp_buffer_read(self, pos, siz)
+    while end > 0:
+        pos = max(end - siz, 0)
+        bufs, is_equal = __cmp_buffer_read(self, pos, end - pos)
         if bufs is None:
             break
-        if find_equal and is_equal: # short cut
-            __cmp_buffer_goto(self, pos + len(bufs[0]) - 1)
-            return
         assert len(set([len(b) for b in bufs])) == 1
-        n = len(bufs[0])
-        for x in util.get_xrange(n):
-            for i in util.get_xrange(len(bufs)):
-                if i == 0:
-                    continue
-                a = bufs[i - 1]
-                b = bufs[i]
-                xx = n - 1 - x
-                if fn(a[xx], b[xx]):
-                    __cmp_buffer_goto(self, pos + xx)
-                    return
-        if n <= siz and pos == 0:
-            break
-        pos -= siz
-        if pos < 0:
-            pos = 0
-        if screen.test_signal():
+        if is_equal:
+            if find_equal: # short cut
+                __cmp_buffer_goto(self, pos + len(bufs[0]) - 1)
+                return
+        else:
+            x = __cmp_buffer_find(bufs, find_equal, True)
+            if x != -1:
+                __cmp_buffer_goto(self, pos + x)
+                return
+        end = pos
+        if end > 0 and screen.test_signal():
             self.co.flash("Reverse cmp interrupted")
             return
+        siz = __cmp_buffer_next_size(siz)
     if beg == max_pos: # can only tell if started from the end
         if find_equal:
             self.co.show("Buffers have nothing in common")
@@ -1336,6 +1368,39 @@ def __cmpr_buffer(self, pos, fn):
     else:
         self.co.show("Done")
 
+def __cmp_buffer_next_size(siz):
+    # read more as long as blocks keep matching
+    return max(siz, min(siz * 2, setting.cmp_read_size_limit))
+
+def __cmp_buffer_find(bufs, find_equal, reverse):
+    # first (or last if reverse) offset where any adjacent pair of buffers
+    # differs (or matches if find_equal), or -1
+    n = min([len(b) for b in bufs])
+    if not n:
+        return -1
+    bufs = [b if len(b) == n else b[:n] for b in bufs]
+    ret = -1
+    for i in util.get_xrange(1, len(bufs)):
+        a = bufs[i - 1]
+        b = bufs[i]
+        if a == b:
+            if not find_equal:
+                continue
+            x = n - 1 if reverse else 0
+        else:
+            # zero bytes in xor'd buffer are where a and b match
+            d = filebytes.xor(a, b)
+            if find_equal:
+                x = d.rfind(filebytes.ZERO) if reverse else \
+                    d.find(filebytes.ZERO)
+            else:
+                x = len(d.rstrip(filebytes.ZERO)) - 1 if reverse else \
+                    n - len(d.lstrip(filebytes.ZERO))
+        if x != -1:
+            if ret == -1 or (x > ret if reverse else x < ret):
+                ret = x
+    return ret
+
 def __cmp_buffer_prep(self):
     if len(self.co) < 2:
         self.co.flash("More than one windows required")
@@ -1605,8 +1670,16 @@ def __search(self, s, amp, is_forward):
             return -1
 
 def __do_search(self, pos, s, is_forward, is_last):
-    word = util.pack_hex_string(s[1:])
-    b = util.str_to_bytes(word)
+    try:
+        b = search.get_pattern(s[1:])
+    except search.PatternError as e:
+        self.co.flash(e)
+        return -1
+    if b is None:
+        word = util.pack_hex_string(s[1:])
+        b = util.str_to_bytes(word)
+    else:
+        word = s[1:]
     if is_forward:
         fn = self.co.search
     else:
@@ -425,6 +425,24 @@ def newwin(leny, lenx, begy, begx, ref=None):
     else:
         return curses.newwin(leny, lenx, begy, begx)
 
+def has_input(scr):
+    """Return True if input is pending, without consuming it"""
+    if isinstance(scr, GenericWindow):
+        return scr.has_input()
+    else:
+        return _poll_input(scr)
+
+def _poll_input(scr):
+    scr.nodelay(1)
+    try:
+        x = scr.getch()
+    finally:
+        scr.nodelay(0)
+    if x == curses.ERR:
+        return False
+    curses.ungetch(x) # next getch(3X) returns this
+    return True
+
 def get_size():
     if util.is_python_version_or_ht(3, 5):
         curses.update_lines_cols()
@@ -570,6 +588,9 @@ class GenericWindow (object):
     def _getch(self):
         return self.__scr.getch()
 
+    def has_input(self):
+        return _poll_input(self.__scr)
+
 class SeqWindow (GenericWindow):
     def __init__(self, leny, lenx, begy, begx, ref):
         super(SeqWindow, self).__init__(leny, lenx, begy, begx, ref)
@@ -612,6 +633,11 @@ class SeqWindow (GenericWindow):
     def preprocess(self, x, l):
         return
 
+    def has_input(self):
+        if self.__ib or self.__ob:
+            return True
+        return super(SeqWindow, self).has_input()
+
     def getch(self):
         x = self.__fetch_output()
         if x is not None:
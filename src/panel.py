@@ -1042,6 +1042,16 @@ class DisplayCanvas (PageLineCanvas):
         b = self.fileops.read(beg, end - beg) # end not inclusive
         if not b:
             return d
+        if not isinstance(s, filebytes.TYPE): # search.Pattern
+            for found, n in s.iter_match(b):
+                i = beg + found
+                if i >= end:
+                    break
+                bb = b[found : found + n]
+                for j, _ in enumerate(filebytes.iter_ords(bb)):
+                    x = i + j
+                    d[x] = self.update_search(x, screen.buf_attr[_], x == pos)
+            return d
         found = 0
         while True:
             found = util.find_string(b, s, found)
@@ -0,0 +1,249 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import random
+
+from . import filebytes
+from . import util
+
+# buffer types
+ORIGINAL = 0
+ADD      = 1
+
+class Piece (object):
+    def __init__(self, type, offset, length, prio=None):
+        self.type = type
+        self.offset = offset
+        self.length = length
+        if prio is None:
+            self.prio = _random.random()
+        else:
+            self.prio = prio
+        self.left = None
+        self.right = None
+        self.total = length
+        self.count = 1
+
+    def __str__(self):
+        return "{0} {1} {2}".format(("orig", "add")[self.type], self.offset,
+            self.length)
+
+    def update(self):
+        self.total = self.length
+        self.count = 1
+        if self.left:
+            self.total += self.left.total
+            self.count += self.left.count
+        if self.right:
+            self.total += self.right.total
+            self.count += self.right.count
+
+# Piece table with a treap of pieces keyed by cumulative length.
+# The original buffer is never modified, and inserted bytes are
+# appended to the add buffer, so insert/delete/read are O(log pieces).
+class PieceTable (object):
+    def __init__(self, b):
+        self.init(b)
+
+    def __len__(self):
+        return _get_total(self.__root)
+
+    def __str__(self):
+        l = []
+        l.append("piece total {0}".format(self.get_count()))
+        l.append("original size {0}".format(util.get_size_repr(
+            len(self.__orig))))
+        l.append("add size {0}".format(util.get_size_repr(len(self.__add))))
+        l.append("tree depth {0}".format(self.get_depth()))
+        return '\n'.join(l)
+
+    def init(self, b):
+        assert isinstance(b, filebytes.TYPE), type(b)
+        self.__orig = b
+        self.__add = bytearray()
+        if b:
+            self.__root = Piece(ORIGINAL, 0, len(b))
+        else:
+            self.__root = None
+
+    def get_count(self):
+        if self.__root:
+            return self.__root.count
+        else:
+            return 0
+
+    def get_depth(self):
+        def fn(o):
+            if o is None:
+                return 0
+            return 1 + max(fn(o.left), fn(o.right))
+        return fn(self.__root)
+
+    def iter_piece(self, x):
+        """Yield pieces from x in order with local offset of the first one"""
+        stack = []
+        o = self.__root
+        while o:
+            n = _get_total(o.left)
+            if x < n:
+                stack.append(o)
+                o = o.left
+            elif x < n + o.length:
+                break
+            else:
+                x -= n + o.length
+                o = o.right
+        if o is None:
+            return
+        yield o, x - n
+        o = o.right
+        while True:
+            while o:
+                stack.append(o)
+                o = o.left
+            if not stack:
+                break
+            o = stack.pop()
+            yield o, 0
+            o = o.right
+
+    def read(self, x, n):
+        if n <= 0:
+            return filebytes.BLANK
+        l = []
+        for o, d in self.iter_piece(x):
+            siz = o.length - d
+            if siz > n:
+                siz = n
+            l.append(self.__read_piece(o, d, siz))
+            n -= siz
+            if n <= 0:
+                break
+        return filebytes.join(l)
+
+    def __read_piece(self, o, d, n):
+        x = o.offset + d
+        if o.type == ORIGINAL:
+            return self.__orig[x : x + n]
+        else:
+            return _to_bytes(self.__add[x : x + n])
+
+    def insert(self, x, b):
+        n = len(b)
+        if not n:
+            return 0
+        pos = len(self.__add)
+        self.__add.extend(b)
+        l, r = _split(self.__root, x)
+        if self.__extend_last_piece(l, pos, n) == -1:
+            l = _merge(l, Piece(ADD, pos, n))
+        self.__root = _merge(l, r)
+        return n
+
+    # coalesce sequential typing into a single add piece
+    def __extend_last_piece(self, o, pos, n):
+        path = []
+        while o:
+            path.append(o)
+            o = o.right
+        if not path:
+            return -1
+        o = path[-1]
+        if o.type != ADD or o.offset + o.length != pos:
+            return -1
+        o.length += n
+        for o in reversed(path):
+            o.update()
+
+    def delete(self, x, n):
+        """Return bytes removed from [x, x+n)"""
+        l, r = _split(self.__root, x)
+        m, r = _split(r, n)
+        self.__root = _merge(l, r)
+        ret = []
+        if m:
+            stack = []
+            o = m
+            while stack or o:
+                while o:
+                    stack.append(o)
+                    o = o.left
+                o = stack.pop()
+                ret.append(self.__read_piece(o, 0, o.length))
+                o = o.right
+        return filebytes.join(ret)
+
+def _get_total(o):
+    if o:
+        return o.total
+    else:
+        return 0
+
+def _split(o, x):
+    """Split o into pieces before x and pieces from x"""
+    if o is None:
+        return None, None
+    n = _get_total(o.left)
+    if x <= n:
+        l, r = _split(o.left, x)
+        o.left = r
+        o.update()
+        return l, o
+    elif x >= n + o.length:
+        l, r = _split(o.right, x - n - o.length)
+        o.right = l
+        o.update()
+        return o, r
+    else:
+        # inherit priority to keep heap order of o.right
+        d = x - n
+        new = Piece(o.type, o.offset + d, o.length - d, o.prio)
+        new.right = o.right
+        new.update()
+        o.length = d
+        o.right = None
+        o.update()
+        return o, new
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        a.update()
+        return a
+    else:
+        b.left = _merge(a, b.left)
+        b.update()
+        return b
+
+_random = random.Random()
+
+if util.is_python2():
+    def _to_bytes(b):
+        return str(b)
+else:
+    def _to_bytes(b):
+        return b # bytes.join() takes bytearray
@@ -0,0 +1,85 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import with_statement
+import threading
+
+from . import log
+
+# read ranges requested by foreground in background thread
+class Prefetcher (object):
+    def __init__(self, fn):
+        self.__fn = fn
+        self.__cond = threading.Condition()
+        self.__req = None
+        self.__gen = 0
+        self.__exit = False
+        self.request_count = 0
+        self.cancel_count = 0
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __str__(self):
+        return "prefetch request {0} cancel {1}".format(self.request_count,
+            self.cancel_count)
+
+    def cleanup(self):
+        with self.__cond:
+            self.__exit = True
+            self.__req = None
+            self.__gen += 1
+            self.__cond.notify()
+        self.__thread.join()
+
+    def request(self, beg, end):
+        # replaces pending request if any
+        with self.__cond:
+            self.__req = beg, end
+            self.request_count += 1
+            self.__cond.notify()
+
+    def cancel(self):
+        # pending request is dropped, and running one stops
+        with self.__cond:
+            self.__req = None
+            self.__gen += 1
+            self.cancel_count += 1
+
+    def is_canceled(self, gen):
+        return gen != self.__gen
+
+    def __run(self):
+        while True:
+            with self.__cond:
+                while self.__req is None and not self.__exit:
+                    self.__cond.wait()
+                if self.__exit:
+                    return
+                beg, end = self.__req
+                self.__req = None
+                gen = self.__gen
+            try:
+                self.__fn(beg, end, gen)
+            except Exception as e:
+                log.debug(e)
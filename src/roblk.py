@@ -44,6 +44,9 @@ class Fileobj (rofd.Fileobj, blk.methods):
     def creat(self, f):
         self.creat_blk()
 
+    def open_file(self, mode):
+        return self.open_blk(mode)
+
     def read(self, x, n):
         try:
             return super(Fileobj, self).read(x, n)
@@ -29,8 +29,7 @@ from . import chunk
 from . import filebytes
 from . import fileobj
 from . import kernel
-from . import log
-from . import screen
+from . import search
 from . import setting
 from . import util
 
@@ -43,8 +42,8 @@ class Fileobj (fileobj.Fileobj):
     _partial  = True
 
     def __init__(self, f, offset=0, length=0):
-        self.cbuf = []
-        self.__thresh = 0
+        self.cbuf = chunk.ChunkList()
+        self.cache = None
         self.set_size(0)
         super(Fileobj, self).__init__(f, offset, length)
 
@@ -52,15 +51,21 @@ class Fileobj (fileobj.Fileobj):
         l = []
         l.append("size " + util.get_size_repr(self.get_size()))
         l.append("chunk size {0}[B]".format(self.get_chunk_size()))
-        l.append("chunk total {0}\n".format(len(self.cbuf)))
+        l.append("chunk total {0}".format(len(self.cbuf)))
+        if self.cache is not None:
+            l.append(str(self.cache))
+        l.append('')
         for i, o in enumerate(self.cbuf):
             l.append("[{0}] {1}".format(i, o))
         return '\n'.join(l)
 
     def ctr(self):
         f = self.get_path()
-        assert not self.cbuf
+        assert not len(self.cbuf)
         assert os.path.isfile(f), f
+        if setting.use_buffer_lazy_load:
+            self.init_lazy_chunk(kernel.fopen(f))
+            return
         with kernel.fopen(f) as fd:
             fd.seek(self.get_mapping_offset())
             length = self.get_mapping_length()
@@ -69,6 +74,11 @@ class Fileobj (fileobj.Fileobj):
             else:
                 self.init_chunk(fd.read())
 
+    def dtr(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
     def is_dirty(self):
         return False
 
@@ -85,32 +95,36 @@ class Fileobj (fileobj.Fileobj):
         else:
             return kernel.get_page_size()
 
-    def set_search_thresh(self):
-        # heuristic
-        if len(self.cbuf) > 10000:
-            r = 0.01
-        elif len(self.cbuf) > 1000:
-            r = 0.02
-        elif len(self.cbuf) > 20:
-            r = 0.1
-        else:
-            r = 0.5
-        self.__thresh = int(self.get_size() * r)
-        log.debug("'{0}' has search thresh at {1}[B]/{2}[B]".format(
-            self.get_short_path(), self.__thresh, self.get_size()))
-
     def alloc_chunk(self, offset, buf):
         return chunk.Chunk(offset, buf)
 
     def init_chunk(self, b):
-        self.cbuf = []
+        l = []
         siz = self.get_chunk_size()
         for i in util.get_xrange(0, len(b), siz):
             bb = b[i : i + siz]
-            self.cbuf.append(self.alloc_chunk(i, bb))
+            l.append(self.alloc_chunk(i, bb))
+        self.cbuf = chunk.ChunkList(l)
         self.set_size(len(b))
         self.mark_chunk()
-        self.set_search_thresh()
+
+    def init_lazy_chunk(self, fd):
+        # chunks keep reading from fd regardless of file rename on sync
+        offset = self.get_mapping_offset()
+        length = self.get_mapping_length()
+        size = max(kernel.get_size(self.get_path()) - offset, 0)
+        if not length or length > size:
+            length = size
+        self.cache = chunk.ChunkCache(fd, setting.buffer_lazy_cache_size)
+        l = []
+        siz = util.roundup(setting.buffer_lazy_chunk_size,
+            self.get_chunk_size())
+        for i in util.get_xrange(0, length, siz):
+            n = min(siz, length - i)
+            l.append(chunk.LazyChunk(i, offset + i, n, self.cache))
+        self.cbuf = chunk.ChunkList(l)
+        self.set_size(length)
+        self.mark_chunk()
 
     def mark_chunk(self):
         if not self.cbuf:
@@ -119,73 +133,16 @@ class Fileobj (fileobj.Fileobj):
         self.cbuf[-1].islast = True
 
     def find(self, x, s, end):
-        for o in self.cbuf:
-            if end != -1 and x >= end:
-                break
-            if x in o:
-                i = self.cbuf.index(o)
-                if i < len(self.cbuf) - 1:
-                    pos = self.cbuf[i + 1].offset
-                    siz = len(s) - 1
-                    b = self.read(pos, siz)
-                else:
-                    b = filebytes.BLANK
-                ret = o.search(x, s, b)
-                if ret != fileobj.NOTFOUND:
-                    return ret
-                x = o.offset + len(o)
-            if screen.test_signal():
-                return fileobj.INTERRUPT
-        return fileobj.NOTFOUND
+        return search.find(self, x, s, end)
 
     def rfind(self, x, s, end):
-        for o in reversed(self.cbuf):
-            if end != -1 and x <= end:
-                break
-            if x in o:
-                i = self.cbuf.index(o)
-                if i > 0:
-                    siz = len(s) - 1
-                    pos = o.offset - siz
-                    if pos < 0:
-                        siz = o.offset
-                        pos = 0
-                    b = self.read(pos, siz)
-                else:
-                    b = filebytes.BLANK
-                ret = o.rsearch(x, s, b)
-                if ret != fileobj.NOTFOUND:
-                    return ret
-                x = o.offset - 1
-            if screen.test_signal():
-                return fileobj.INTERRUPT
-        return fileobj.NOTFOUND
+        return search.rfind(self, x, s, end)
 
     def iter_chunk(self, pos):
-        index = self.get_chunk_index(pos)
-        for i in util.get_xrange(index, len(self.cbuf)):
-            yield self.cbuf[i]
+        return self.cbuf.iter_from(self.get_chunk_index(pos))
 
     def get_chunk_index(self, pos):
-        if pos <= self.__thresh:
-            for o in self.cbuf:
-                if pos in o:
-                    return self.cbuf.index(o)
-        else:
-            beg = 0
-            end = len(self.cbuf) - 1
-            while True:
-                i = (beg + end) // 2
-                o = self.cbuf[i]
-                if pos in o:
-                    return self.cbuf.index(o)
-                if pos < o.offset:
-                    end = i - 1
-                elif pos > o.offset + len(o) - 1:
-                    beg = i + 1
-                if beg > end:
-                    break
-        assert False, pos
+        return self.cbuf.find(pos)
 
     def read(self, x, n):
         if not n:
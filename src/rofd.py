@@ -21,13 +21,18 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+from __future__ import with_statement
 import collections
 import os
+import threading
 
+from . import filebytes
 from . import fileobj
+from . import holemap
 from . import kernel
 from . import log
-from . import screen
+from . import prefetch
+from . import search
 from . import setting
 from . import util
 
@@ -41,22 +46,42 @@ class Fileobj (fileobj.Fileobj):
 
     def __init__(self, f, offset=0, length=0):
         self.fd = None
+        self.lock = threading.RLock() # fd and cache are shared with prefetcher
         self.__size = -1
         self.__align = 0
         self.__ra_window = None
-        self.__ra_queue = collections.deque()
+        self.__ra_cache = collections.OrderedDict() # block index -> buffer
+        self.__ra_cache_size = 0
+        self.__ra_prev = 0, 0 # previous read range
+        self.__ra_dir = 0 # 1 if forward, -1 if backward, 0 otherwise
+        self.__ra_size = 0
         self.__ra_count = collections.defaultdict(int)
+        self.__ra_hit = 0
+        self.__ra_miss = 0
+        self.__ra_bytes = 0
         self.__count = collections.defaultdict(int)
+        self.__hole_map = None
+        self.__prefetcher = None
+        self.__prefetch_prev = 0, 0 # previous page read
+        self.__prefetch_req = None # range to prefetch on next idle
+        self.__prefetch_run = None # range being prefetched
+        self.__prefetch_bytes = 0
         super(Fileobj, self).__init__(f, offset, length)
 
     def __str__(self):
         sl = []
         sl.append("read align {0}".format(self.__align))
         sl.append("read_ahead window {0}".format(str(self.__ra_window)))
-        sl.append("\nread_ahead size range")
-        for i, o in enumerate(self.__ra_queue):
-            sl.append("#{0} {1}[B] {2}-{3}[B]".format(
-                i, o.end - o.beg, o.beg, o.end))
+        sl.append("read_ahead size {0}[B] direction {1}".format(
+            self.__ra_size, self.__ra_dir))
+        sl.append("read_ahead cache {0} blocks {1}/{2}[B]".format(
+            len(self.__ra_cache), self.__ra_cache_size,
+            setting.read_ahead_cache_size))
+        sl.append("read_ahead hit {0} miss {1} bytes {2}[B]".format(
+            self.__ra_hit, self.__ra_miss, self.__ra_bytes))
+        if self.__prefetcher:
+            sl.append("{0} bytes {1}[B]".format(str(self.__prefetcher),
+                self.__prefetch_bytes))
         sl.append("\nread_ahead count {0}".format(
             sum(self.__ra_count.values())))
         for k in sorted(self.__ra_count.keys()):
@@ -78,6 +103,10 @@ class Fileobj (fileobj.Fileobj):
         assert os.path.exists(self.get_path())
 
     def dtr(self):
+        if self.__prefetcher:
+            self.__prefetcher.cleanup()
+            self.__prefetcher = None
+        self.__drop_hole_map()
         if self.fd and not self.fd.closed:
             self.fd.close()
 
@@ -86,11 +115,33 @@ class Fileobj (fileobj.Fileobj):
             mode = 'r'
         else:
             mode = 'r+'
-        self.fd = kernel.fopen(self.get_path(), mode)
+        self.fd = self.open_file(mode)
+        if setting.use_prefetch and not self.__prefetcher:
+            self.__prefetcher = prefetch.Prefetcher(self.__prefetch)
+
+    def open_file(self, mode):
+        return kernel.fopen(self.get_path(), mode)
 
     def is_dirty(self):
         return False
 
+    def get_fileno(self):
+        if self.fd and not self.fd.closed:
+            return self.fd.fileno()
+        return -1
+
+    def get_hole_map(self):
+        if self.__hole_map is None and kernel.has_seek_hole():
+            # not self.fd, prefetcher may be between seek and read
+            self.__hole_map = holemap.HoleMap(self.get_path(),
+                self.get_mapping_offset(), self.get_size())
+        return self.__hole_map
+
+    def __drop_hole_map(self):
+        if self.__hole_map:
+            self.__hole_map.cleanup()
+            self.__hole_map = None
+
     def get_size(self):
         return self.__size
 
@@ -119,76 +170,198 @@ class Fileobj (fileobj.Fileobj):
         self.__ra_window = beg, end
 
     def find(self, x, s, end):
-        n = self.get_buffer_size()
-        while True:
-            if end != -1 and x >= end:
-                return fileobj.NOTFOUND
-            b = self.read(x, n)
-            pos = util.find_string(b, s)
-            if pos >= 0:
-                return x + pos
-            elif x + len(b) >= self.get_size():
-                return fileobj.NOTFOUND
-            x += (n - len(s))
-            if screen.test_signal():
-                return fileobj.INTERRUPT
+        return search.find(self, x, s, end)
 
     def rfind(self, x, s, end):
-        bufsiz = self.get_buffer_size()
-        while True:
-            if end != -1 and x <= end:
-                return fileobj.NOTFOUND
-            n = bufsiz
-            i = x + 1 - n
-            if i < 0:
-                i = 0
-                n = x + 1
-            pos = util.rfind_string(self.read(i, n), s)
-            if pos >= 0:
-                return i + pos
-            elif not i:
-                return fileobj.NOTFOUND
-            x -= (n - len(s))
-            if screen.test_signal():
-                return fileobj.INTERRUPT
+        return search.rfind(self, x, s, end)
 
     def read(self, x, n):
         x += self.get_mapping_offset()
-        o = None
-        for e in self.__ra_queue:
-            if x >= e.beg and x + n <= e.end:
-                o = e
-                break
-        if not o:
+        if self.__prefetcher:
+            self.__set_prefetch(x, n)
+        with self.lock:
+            d = self.__get_direction(x, n)
+            b = self.__read_cache(x, n)
+            if b is None:
+                self.__ra_miss += 1
+                b = self.__read_ahead(x, n, d)
+            else:
+                self.__ra_hit += 1
+            self.__ra_prev = x, x + n
+            self.__ra_dir = d
+            self.__count[n] += 1
+        return b
+
+    def start_prefetch(self):
+        # called while idle, so foreground rarely waits for prefetch
+        if self.__prefetcher and self.__prefetch_req:
+            beg, end = self.__prefetch_req
+            self.__prefetch_req = None
+            self.__prefetcher.request(beg, end)
+            self.__prefetch_run = beg, end
+
+    def has_dirty_block(self, beg, end):
+        return False
+
+    def invalidate_cache(self, beg, end):
+        # beg and end are absolute offsets
+        if self.__prefetcher:
+            self.__prefetcher.cancel()
+            self.__prefetch_req = self.__prefetch_run = None
+        self.__drop_hole_map() # holes may have been written
+        siz = self.__get_ra_block_size()
+        with self.lock:
+            for i in util.get_xrange(beg // siz, util.howmany(end, siz)):
+                if i in self.__ra_cache:
+                    self.__ra_cache_size -= len(self.__ra_cache.pop(i))
+
+    def __set_prefetch(self, x, n):
+        # don't contend with foreground, resume on next idle
+        if self.__prefetch_run:
+            self.__prefetcher.cancel()
+            if self.__prefetch_req is None:
+                self.__prefetch_req = self.__prefetch_run
+            self.__prefetch_run = None
+        # follow page reads, not small reads of e.g. cursor position
+        beg, end = self.__prefetch_prev
+        if n * 2 < end - beg:
+            return
+        self.__prefetch_prev = x, x + n
+        # next or previous pages in scroll direction, none on seek
+        siz = max(self.__ra_size, n * 2)
+        if beg < x <= end:
+            self.__prefetch_req = x + n, x + n + siz
+        elif x < beg <= x + n:
+            self.__prefetch_req = max(x - siz, 0), x
+        elif x != beg: # not reread by repaint
+            self.__prefetch_req = None
+
+    def __prefetch(self, beg, end, gen):
+        siz = self.__get_ra_block_size()
+        eof = self.get_mapping_offset() + self.get_size()
+        for i in util.get_xrange(beg // siz, util.howmany(min(end, eof), siz)):
+            # release lock per block so foreground read can proceed
+            with self.lock:
+                if self.__prefetcher.is_canceled(gen):
+                    return
+                if i in self.__ra_cache:
+                    continue
+                x = i * siz
+                if self.has_dirty_block(x, x + siz):
+                    continue # never cache what's pending to be written
+                self.fd.seek(x)
+                b = self.fd.read(siz)
+                if not b:
+                    return
+                self.__add_cache(i, b)
+                self.__prefetch_bytes += len(b)
+
+    def __get_direction(self, x, n):
+        beg, end = self.__ra_prev
+        if x == beg:
+            return self.__ra_dir # e.g. reread by repaint
+        elif beg < x <= end:
+            return 1
+        elif x < beg <= x + n:
+            return -1
+        else:
+            return 0
+
+    def __get_ra_block_size(self):
+        siz = setting.read_ahead_block_size
+        if self.__align:
+            siz = util.roundup(siz, self.__align)
+        return siz
+
+    def __read_cache(self, x, n):
+        if n <= 0:
+            return None
+        siz = self.__get_ra_block_size()
+        l = []
+        for i in util.get_xrange(x // siz, (x + n - 1) // siz + 1):
+            b = self.__ra_cache.get(i)
+            if b is None:
+                return None
+            self.__touch_cache(i)
+            l.append(b)
+            if len(b) < siz:
+                break # end of file
+        if len(l) == 1:
+            b = l[0]
+        else:
+            b = filebytes.join(l)
+        x -= util.rounddown(x, siz)
+        return b[x : x + n]
+
+    def __read_ahead(self, x, n, d):
+        # grow read-ahead size while sequential in the same direction
+        siz = self.__get_ra_block_size()
+        if d and d == self.__ra_dir and self.__ra_size:
+            self.__ra_size = min(self.__ra_size * 2,
+                setting.read_ahead_size_limit)
+        else:
+            self.__ra_size = siz
+        ra_size = max(self.__ra_size, n)
+        if d > 0:
             beg = x
-            beg -= n * self.__ra_window[0]
-            if beg < 0:
-                beg = 0
+            end = x + ra_size
+        elif d < 0:
+            beg = x + n - ra_size
             end = x + n
-            end += n * self.__ra_window[1]
-
-            if self.__align:
-                beg, end = util.align_range(beg, end, self.__align)
-            try:
-                self.fd.seek(beg)
-                b = self.fd.read(end - beg)
-            except Exception as e:
-                # Don't unconditionally log an exception for blkdev.
-                if setting.use_debug:
-                    log.error(e, (x, n), (beg, end))
-                beg = x
-                end = x + n
-                self.fd.seek(beg)
-                b = self.fd.read(end - beg)
-
-            o = util.Namespace(beg=beg, end=beg + len(b), buf=b)
-            self.__ra_count[end - beg] += 1
-            self.__ra_queue.appendleft(o)
-            if len(self.__ra_queue) > _ra_queue_size:
-                self.__ra_queue.pop()
-
-        self.__count[n] += 1
-        x -= o.beg
-        return o.buf[x : x + n]
-
-_ra_queue_size = 5
+        else:
+            beg = x - n * self.__ra_window[0]
+            end = x + n + n * self.__ra_window[1]
+        if beg < 0:
+            beg = 0
+        beg = util.rounddown(beg, siz)
+        end = util.roundup(end, siz)
+        # don't reread cached blocks at both ends
+        while end - siz > x and (end - siz) // siz in self.__ra_cache:
+            end -= siz
+        while beg + siz <= x and beg // siz in self.__ra_cache:
+            beg += siz
+
+        try:
+            self.fd.seek(beg)
+            b = self.fd.read(end - beg)
+        except Exception as e:
+            # Don't unconditionally log an exception for blkdev.
+            if setting.use_debug:
+                log.error(e, (x, n), (beg, end))
+            self.fd.seek(x)
+            b = self.fd.read(n) # don't cache
+            self.__ra_count[n] += 1
+            self.__ra_bytes += len(b)
+            return b
+
+        self.__ra_count[end - beg] += 1
+        self.__ra_bytes += len(b)
+        for i in util.get_xrange(0, len(b), siz):
+            self.__add_cache((beg + i) // siz, b[i : i + siz])
+        if x + n <= beg + len(b) or len(b) < end - beg:
+            x -= beg
+            return b[x : x + n]
+        ret = self.__read_cache(x, n) # partially cached before
+        if ret is None:
+            self.fd.seek(x)
+            ret = self.fd.read(n)
+        return ret
+
+    def __touch_cache(self, i):
+        # evict least recently used block first
+        if _has_move_to_end:
+            self.__ra_cache.move_to_end(i)
+        else:
+            self.__ra_cache[i] = self.__ra_cache.pop(i)
+
+    def __add_cache(self, i, b):
+        if i in self.__ra_cache:
+            self.__ra_cache_size -= len(self.__ra_cache.pop(i))
+        self.__ra_cache[i] = b
+        self.__ra_cache_size += len(b)
+        while self.__ra_cache_size > setting.read_ahead_cache_size and \
+            len(self.__ra_cache) > 1:
+            _, b = self.__ra_cache.popitem(last=False)
+            self.__ra_cache_size -= len(b)
+
+_has_move_to_end = hasattr(collections.OrderedDict, "move_to_end")
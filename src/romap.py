@@ -22,11 +22,15 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from __future__ import with_statement
+import collections
 import mmap
+import time
 
 from . import fileobj
+from . import holemap
 from . import kernel
 from . import screen
+from . import search
 from . import setting
 from . import util
 
@@ -60,6 +64,14 @@ class Fileobj (fileobj.Fileobj):
 
     def __init__(self, f, offset=0, length=0):
         self.__set_delta(0, 0)
+        self.__hole_map = None
+        self.__adv_prev = 0, 0 # previous read range
+        self.__adv_seq = 0 # sequentially read bytes
+        self.__adv_cold = -1 # start of pages not yet passed by scan
+        self.__adv_pattern = "MADV_NORMAL"
+        self.__scan_fault = None
+        self.__adv_count = collections.defaultdict(int)
+        self.__op_count = collections.defaultdict(lambda: [0, 0, 0, 0.0])
         self.map = None
         super(Fileobj, self).__init__(f, offset, length)
 
@@ -69,6 +81,14 @@ class Fileobj (fileobj.Fileobj):
         l.append("map.tell {0}".format(self.map.tell()))
         l.append("map.size {0}".format(self.map.size()))
         l.append("size {0}".format(self.get_size()))
+        l.append("\nmadvise count {0}".format(sum(self.__adv_count.values())))
+        for k in sorted(self.__adv_count.keys()):
+            l.append("{0} {1}".format(k, self.__adv_count[k]))
+        l.append("\nfault count")
+        for k in sorted(self.__op_count.keys()):
+            n, minflt, majflt, t = self.__op_count[k]
+            l.append("{0} {1} minflt {2} majflt {3} time {4:.6f}".format(
+                k, n, minflt, majflt, t))
         return '\n'.join(l)
 
     def ctr(self):
@@ -78,7 +98,11 @@ class Fileobj (fileobj.Fileobj):
             raise fileobj.Error("Can not mmap(2) " + self.get_path())
 
     def dtr(self):
+        self.__end_scan()
         self.cleanup_mapping()
+        if self.__hole_map:
+            self.__hole_map.cleanup()
+            self.__hole_map = None
 
     def init_mapping(self, f):
         with kernel.fopen(f, 'r+') as fd:
@@ -134,15 +158,34 @@ class Fileobj (fileobj.Fileobj):
     def is_dirty(self):
         return False
 
+    def get_hole_map(self):
+        # mapping may have been written to unless readonly
+        if not self.is_readonly() or not kernel.has_seek_hole():
+            return None
+        if self.__hole_map is None:
+            self.__hole_map = holemap.HoleMap(self.get_path(),
+                self.get_mapping_offset(), self.get_size())
+        return self.__hole_map
+
     def get_size(self):
         return len(self.map) - self.__size_delta
 
     def find(self, x, s, end):
         if setting.use_ignorecase:
-            ret = self.__find(x, s, end)
+            ret = search.find(self, x, s, end)
         else:
             d = self.get_mmap_offset()
-            ret = self.map.find(s, x + d)
+            beg = x + d
+            if end == -1:
+                end = len(self.map)
+            else:
+                end += d + len(s) - 1
+            self.__set_pattern("MADV_SEQUENTIAL")
+            fault = self.__get_fault()
+            ret = self.map.find(s, beg, end)
+            self.__add_fault("find", fault)
+            self.__set_pattern("MADV_NORMAL")
+            self.__advise_scanned(beg, ret if ret >= 0 else end)
             if ret >= 0:
                 ret -= d
             else:
@@ -150,27 +193,16 @@ class Fileobj (fileobj.Fileobj):
         screen.cli()
         return ret
 
-    def __find(self, x, s, end):
-        n = self.get_buffer_size()
-        while True:
-            if end != -1 and x >= end:
-                return fileobj.NOTFOUND
-            b = self.read(x, n)
-            pos = util.find_string(b, s)
-            if pos >= 0:
-                return x + pos
-            elif x + len(b) >= self.get_size():
-                return fileobj.NOTFOUND
-            x += (n - len(s))
-            if screen.test_signal():
-                return fileobj.INTERRUPT
-
     def rfind(self, x, s, end):
         if setting.use_ignorecase or not _has_mmap_rfind:
-            ret = self.__rfind(x, s, end)
+            ret = search.rfind(self, x, s, end)
         else:
             d = self.get_mmap_offset()
-            ret = self.map.rfind(s, 0, x + d + 1)
+            fault = self.__get_fault()
+            ret = self.map.rfind(s, end + d + 1, x + d + 1)
+            self.__add_fault("rfind", fault)
+            self.__advise_scanned(ret + len(s) if ret >= 0 else end + d + 1,
+                x + d + 1)
             if ret >= 0:
                 ret -= d
             else:
@@ -178,25 +210,81 @@ class Fileobj (fileobj.Fileobj):
         screen.cli()
         return ret
 
-    def __rfind(self, x, s, end):
-        bufsiz = self.get_buffer_size()
-        while True:
-            if end != -1 and x <= end:
-                return fileobj.NOTFOUND
-            n = bufsiz
-            i = x + 1 - n
-            if i < 0:
-                i = 0
-                n = x + 1
-            pos = util.rfind_string(self.read(i, n), s)
-            if pos >= 0:
-                return i + pos
-            elif not i:
-                return fileobj.NOTFOUND
-            x -= (n - len(s))
-            if screen.test_signal():
-                return fileobj.INTERRUPT
-
     def read(self, x, n):
         x += self.get_mmap_offset()
+        if setting.use_madvise:
+            self.__advise_read(x, n)
         return self.map[x : x + n]
+
+    def __get_fault(self):
+        if setting.use_madvise:
+            minflt, majflt = kernel.get_fault_count()
+            return minflt, majflt, time.time()
+
+    def __add_fault(self, op, fault):
+        if fault is None:
+            return
+        minflt, majflt, t = self.__get_fault()
+        l = self.__op_count[op]
+        l[0] += 1
+        l[1] += minflt - fault[0]
+        l[2] += majflt - fault[1]
+        l[3] += t - fault[2]
+
+    def __advise(self, name, offset, length):
+        if setting.use_madvise and name and \
+            kernel.madvise(self.map, name, offset, length) != -1:
+            self.__adv_count[name] += 1
+
+    def __set_pattern(self, name):
+        # advise whole mapping, otherwise the mapping is split into
+        # multiple vm areas with different flags and mremap(2) fails
+        if self.__adv_pattern != name:
+            self.__advise(name, 0, len(self.map))
+            self.__adv_pattern = name
+
+    def __get_cold_advice(self):
+        # MADV_DONTNEED may discard changes of private or anonymous mapping
+        if hasattr(mmap, "MADV_COLD"):
+            return "MADV_COLD"
+        elif self.is_readonly():
+            return "MADV_DONTNEED"
+
+    def __advise_read(self, x, n):
+        beg, end = self.__adv_prev
+        self.__adv_prev = x, x + n
+        if x == beg:
+            return # e.g. reread by repaint
+        elif x == end: # e.g. --blkscan, :cmp, search with ignorecase
+            self.__adv_seq += n
+            siz = setting.madvise_scan_size
+            if self.__adv_seq < siz:
+                return
+            if self.__adv_cold == -1:
+                self.__set_pattern("MADV_SEQUENTIAL")
+                self.__adv_cold = x
+                self.__scan_fault = self.__get_fault()
+            elif x - self.__adv_cold >= siz:
+                self.__advise(self.__get_cold_advice(), self.__adv_cold,
+                    x - self.__adv_cold)
+                self.__adv_cold = x
+        else: # e.g. cursor jump, scroll
+            if self.__adv_cold != -1:
+                self.__set_pattern("MADV_NORMAL")
+                self.__adv_cold = -1
+                self.__end_scan()
+            self.__adv_seq = 0
+            # visible page and its neighbours
+            self.__advise("MADV_WILLNEED", x - n, n * 3)
+
+    def __end_scan(self):
+        # sample once per sequential scan, not per read
+        self.__add_fault("scan", self.__scan_fault)
+        self.__scan_fault = None
+
+    def __advise_scanned(self, beg, end):
+        # keep pages of search start and result
+        beg = util.roundup(beg, kernel.get_page_size())
+        end = util.rounddown(end, kernel.get_page_size())
+        if beg < end:
+            self.__advise(self.__get_cold_advice(), beg, end - beg)
@@ -0,0 +1,227 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import division
+import collections
+import mmap
+import os
+
+from . import filebytes
+from . import fileobj
+from . import holemap
+from . import kernel
+from . import screen
+from . import search
+from . import setting
+from . import util
+
+"""
+0        window 0        window 1        window 2              bufsiz
+|----------------+----------------+----------------+-----------| file
+      |<-----------------------length------------------->|
+      offset
+Windows are aligned to window size, which is a multiple of mmap(2)
+allocation granularity, and least recently used ones are unmapped.
+"""
+
+class Fileobj (fileobj.Fileobj):
+    _insert   = False
+    _replace  = False
+    _delete   = False
+    _truncate = False
+    _enabled  = kernel.has_mmap()
+    _partial  = True
+
+    def __init__(self, f, offset=0, length=0):
+        self.fd = None
+        self.__size = -1
+        self.__window_size = util.roundup(setting.map_window_size,
+            mmap.ALLOCATIONGRANULARITY)
+        self.__windows = collections.OrderedDict() # window index -> mmap
+        self.__hit = 0
+        self.__miss = 0
+        self.__unmap = 0
+        self.__hole_map = None
+        super(Fileobj, self).__init__(f, offset, length)
+
+    def __str__(self):
+        l = []
+        l.append("size " + util.get_size_repr(self.get_size()))
+        l.append("window size {0}[B]".format(self.__window_size))
+        l.append("window total {0}/{1}".format(len(self.__windows),
+            setting.map_window_count))
+        l.append("window hit {0} miss {1} unmap {2}".format(self.__hit,
+            self.__miss, self.__unmap))
+        for i, m in self.__windows.items():
+            l.append("[{0}] {1} {2}".format(i, i * self.__window_size, len(m)))
+        return '\n'.join(l)
+
+    def ctr(self):
+        f = self.get_path()
+        size = kernel.read_reg_size(f)
+        if size <= 0: # fallback from romap
+            raise util.Message("Can not mmap(2) " + f)
+        self.set_size(size)
+        self.fd = kernel.fopen(f)
+        assert os.path.exists(self.get_path())
+
+    def dtr(self):
+        while self.__windows:
+            _, m = self.__windows.popitem()
+            m.close()
+        if self.__hole_map:
+            self.__hole_map.cleanup()
+            self.__hole_map = None
+        if self.fd and not self.fd.closed:
+            self.fd.close()
+
+    def is_dirty(self):
+        return False
+
+    def get_fileno(self):
+        if self.fd and not self.fd.closed:
+            return self.fd.fileno()
+        return -1
+
+    def get_hole_map(self):
+        if self.__hole_map is None and kernel.has_seek_hole():
+            self.__hole_map = holemap.HoleMap(self.get_path(),
+                self.get_mapping_offset(), self.get_size())
+        return self.__hole_map
+
+    def get_size(self):
+        return self.__size
+
+    def set_size(self, size):
+        assert self.__size == -1, self.__size
+        length = self.get_mapping_length()
+        if length:
+            self.__size = length
+        else:
+            self.__size = size - self.get_mapping_offset()
+        if self.get_size() <= 0:
+            raise fileobj.Error("Invalid size {0} for {1}".format(
+                util.get_size_repr(self.get_size()), self.get_path()))
+
+    def __get_window(self, i):
+        # least recently used window is unmapped first
+        m = self.__windows.pop(i, None)
+        if m is None:
+            self.__miss += 1
+            while len(self.__windows) >= setting.map_window_count:
+                _, o = self.__windows.popitem(last=False)
+                o.close()
+                self.__unmap += 1
+            beg = i * self.__window_size
+            end = self.get_mapping_offset() + self.get_size()
+            m = kernel.mmap_partial(self.fd.fileno(), beg,
+                min(self.__window_size, end - beg), True)
+        else:
+            self.__hit += 1
+        self.__windows[i] = m
+        return m
+
+    def read(self, x, n):
+        x += self.get_mapping_offset()
+        end = min(x + n, self.get_mapping_offset() + self.get_size())
+        l = []
+        while x < end:
+            i = x // self.__window_size
+            beg = i * self.__window_size
+            m = self.__get_window(i)
+            b = m[x - beg : min(end - beg, len(m))]
+            if not b:
+                break
+            l.append(b)
+            x += len(b)
+        if len(l) == 1:
+            return l[0]
+        return filebytes.join(l)
+
+    def find(self, x, s, end):
+        if setting.use_ignorecase:
+            ret = search.find(self, x, s, end)
+        else:
+            size = self.get_size()
+            if end == -1 or end > size:
+                end = size
+            if x < 0:
+                x = 0
+            # s must start in [x, end)
+            ret = self.__find(x, min(end + len(s) - 1, size), s, False)
+        screen.cli()
+        return ret
+
+    def rfind(self, x, s, end):
+        if setting.use_ignorecase:
+            ret = search.rfind(self, x, s, end)
+        else:
+            size = self.get_size()
+            if x >= size:
+                x = size - 1
+            # s must be within [0, x] and start after end
+            ret = self.__find(max(end + 1, 0), x + 1, s, True)
+        screen.cli()
+        return ret
+
+    def __find(self, beg, end, s, reverse):
+        # find s within [beg, end) in each window and across its boundary
+        n = len(s)
+        if not n or end - beg < n:
+            return fileobj.NOTFOUND
+        offset = self.get_mapping_offset()
+        siz = self.__window_size
+        beg += offset
+        end += offset
+        l = list(util.get_xrange(beg // siz, (end - 1) // siz + 1))
+        if reverse:
+            l.reverse()
+        for i in l:
+            wbeg = i * siz
+            wend = wbeg + siz
+            ll = [(max(beg, wbeg), min(end, wend), True)]
+            if n > 1 and wend < end:
+                ll.append((max(beg, wend - n + 1), min(end, wend + n - 1),
+                    False))
+            if reverse:
+                ll.reverse()
+            for x, xx, is_window in ll:
+                if is_window:
+                    m = self.__get_window(i)
+                    if reverse:
+                        ret = m.rfind(s, x - wbeg, xx - wbeg)
+                    else:
+                        ret = m.find(s, x - wbeg, xx - wbeg)
+                    base = wbeg
+                else:
+                    b = self.read(x - offset, xx - x)
+                    if reverse:
+                        ret = util.rfind_string(b, s)
+                    else:
+                        ret = util.find_string(b, s)
+                    base = x
+                if ret >= 0:
+                    return base + ret - offset
+            if screen.test_signal():
+                return fileobj.INTERRUPT
+        return fileobj.NOTFOUND
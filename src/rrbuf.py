@@ -102,13 +102,6 @@ class Fileobj (robuf.Fileobj):
             if tot <= 0:
                 break
 
-    def seq_to_ords(self, l):
-        # adaptive version of filebytes.seq_to_ords()
-        if isinstance(l[0], filebytes.TYPE):
-            return filebytes.seq_to_ords(l)
-        else:
-            return tuple(l)
-
     def replace(self, x, l, rec=True):
         if x + len(l) > self.get_size():
             l = l[:self.get_size() - x]
@@ -118,13 +111,13 @@ class Fileobj (robuf.Fileobj):
         for o in self.iter_chunk(x):
             ret, orig = o.replace(x, l)
             if rec:
-                buf.extend(orig) # str or int
+                buf.append(orig)
             l = l[ret:]
             x += ret
             if not l:
                 self.set_dirty()
                 if rec:
-                    ubuf = self.seq_to_ords(buf)
+                    ubuf = filebytes.ords(filebytes.join(buf))
                     rbuf = ll[:len(ubuf)]
                     def ufn1(ref):
                         ref.replace(xx, ubuf, False)
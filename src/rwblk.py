@@ -46,6 +46,9 @@ class Fileobj (rwfd.Fileobj, blk.methods):
     def creat(self, f):
         self.creat_blk()
 
+    def open_file(self, mode):
+        return self.open_blk(mode)
+
     def read(self, x, n):
         try:
             return super(Fileobj, self).read(x, n)
@@ -29,7 +29,6 @@ from . import fileobj
 from . import log
 from . import rrbuf
 from . import setting
-from . import util
 
 class Fileobj (rrbuf.Fileobj):
     _insert   = True
@@ -39,46 +38,43 @@ class Fileobj (rrbuf.Fileobj):
     _enabled  = True
     _partial  = True
 
-    def __init__(self, f, offset=0, length=0):
-        self.__count = 0
-        super(Fileobj, self).__init__(f, offset, length)
-
     def ctr(self):
-        assert not self.cbuf
+        assert not len(self.cbuf)
         if os.path.isfile(self.get_path()):
             super(Fileobj, self).ctr()
         else:
             self.init_chunk(filebytes.BLANK)
 
-    def __sync_size(self, o, delta):
-        for i in util.get_xrange(self.cbuf.index(o) + 1, len(self.cbuf)):
-            self.cbuf[i].offset += delta
+    def __sync_size(self, delta):
+        # chunk offsets are derived from self.cbuf
         self.set_size(self.get_size() + delta)
-
-    def __test_balance(self, iosize):
-        if iosize >= self.get_chunk_size():
-            return True
-        self.__count += 1
-        if self.__count == setting.buffer_chunk_balance_interval:
-            self.__count = 0
-            return True
-        else:
-            return False
-
-    def __balance_chunk(self):
-        for o in self.cbuf:
-            if len(o) < self.__get_chunk_size_low():
-                if self.__merge_chunk(o, self.get_chunk_size()) != -1:
-                    break
-        for o in self.cbuf:
-            if len(o) > self.__get_chunk_size_high():
-                if self.__split_chunk(o, self.get_chunk_size()) != -1:
-                    break
         if setting.use_debug:
-            l = [len(o) for o in self.cbuf]
-            log.debug("{0} chunks exist min={1}[B] max={2}[B]".format(len(l),
-                min(l), max(l)))
-        self.set_search_thresh()
+            assert self.get_size() == self.cbuf.get_total(), \
+                (self.get_size(), self.cbuf.get_total())
+
+    def __balance_chunk(self, x, n):
+        # only touch chunks around [x, x+n), and at most
+        # buffer_chunk_balance_limit of them, so the cost per edit
+        # doesn't depend on the buffer size
+        if not len(self.cbuf):
+            return
+        i = self.get_chunk_index(x)
+        if i > 0:
+            i -= 1 # previous chunk may need a merge
+        end = x + n
+        limit = setting.buffer_chunk_balance_limit
+        size = self.get_chunk_size()
+        while limit > 0 and i < len(self.cbuf):
+            o = self.cbuf[i]
+            if o.offset > end:
+                break
+            if len(o) > self.__get_chunk_size_high() and o.is_pinned():
+                i += self.__split_chunk(o, size)
+            else:
+                if len(o) < self.__get_chunk_size_low():
+                    self.__merge_chunk(o, size)
+                i += 1
+            limit -= 1
 
     def __get_chunk_size_low(self):
         ret = self.get_chunk_size() // 10
@@ -93,49 +89,53 @@ class Fileobj (rrbuf.Fileobj):
     def __merge_chunk(self, beg, merge_thresh):
         if len(beg) >= merge_thresh:
             return -1
-        l = self.cbuf[self.cbuf.index(beg):]
+        i = self.cbuf.index(beg)
+        l = []
         size = 0
-        for o in l:
+        for o in self.cbuf.iter_from(i):
+            if not o.is_pinned():
+                break # leave unmodified lazy chunk as is
+            l.append(o)
             size += len(o)
             if size >= merge_thresh:
-                ll = l[:l.index(o) + 1]
-                if len(ll) > 1:
-                    b = filebytes.join([o.read(o.offset, len(o)) for o in ll])
-                    new = self.alloc_chunk(beg.offset, b)
-                    self.cbuf.insert(self.cbuf.index(beg), new)
-                    log.debug("Merge {0} chunks -> #{1}/{2} ({3},{4})".format(
-                        len(ll), self.cbuf.index(new), len(self.cbuf),
-                        new.offset, len(new)))
-                    for o in ll:
-                        self.cbuf.remove(o)
-                self.mark_chunk()
                 break
+        if len(l) > 1: # may not reach merge_thresh at the end
+            offset = beg.offset
+            b = filebytes.join([o.read(o.offset, len(o)) for o in l])
+            for o in l:
+                self.cbuf.remove(o)
+            new = self.alloc_chunk(offset, b)
+            self.cbuf.insert(i, new)
+            log.debug("Merge {0} chunks -> #{1}/{2} ({3},{4})".format(
+                len(l), i, len(self.cbuf), new.offset, len(new)))
+            self.mark_chunk()
 
     def __split_chunk(self, beg, split_thresh):
         if len(beg) <= split_thresh:
             return -1
+        i = self.cbuf.index(beg)
         offset = beg.offset
         size = len(beg)
-        i = 0
+        l = []
         while size > 0:
             b = beg.read(offset, split_thresh)
-            o = self.alloc_chunk(offset, b)
-            self.cbuf.insert(self.cbuf.index(beg) + 1 + i, o)
+            l.append(self.alloc_chunk(offset, b))
             offset += len(b)
             size -= len(b)
-            i += 1
-        log.debug("Split into {0} chunks <- #{1}/{2} ({3},{4})".format(i,
-            self.cbuf.index(beg), len(self.cbuf) - i, beg.offset, len(beg)))
+        log.debug("Split into {0} chunks <- #{1}/{2} ({3},{4})".format(len(l),
+            i, len(self.cbuf), beg.offset, len(beg)))
         self.cbuf.remove(beg)
+        for j, o in enumerate(l):
+            self.cbuf.insert(i + j, o)
         self.mark_chunk()
+        return len(l)
 
     def insert(self, x, l, rec=True):
         o = self.cbuf[self.get_chunk_index(x)]
         n = o.insert(x, l)
-        self.__sync_size(o, n)
+        self.__sync_size(n)
         self.set_dirty()
-        if self.__test_balance(len(l)):
-            self.__balance_chunk()
+        self.__balance_chunk(x, n)
         if rec:
             buf = l[:n]
             def ufn(ref):
@@ -157,18 +157,17 @@ class Fileobj (rrbuf.Fileobj):
         for o in self.iter_chunk(x):
             ret, orig = o.replace(x, l)
             if rec:
-                buf.extend(orig) # str or int
+                buf.append(orig)
             l = l[ret:]
             x += ret
             if not l:
                 delta = len(self.cbuf[-1]) - endsize
                 if delta:
-                    self.__sync_size(self.cbuf[-1], delta)
+                    self.__sync_size(delta)
                 self.set_dirty()
-                if self.__test_balance(len(ll)):
-                    self.__balance_chunk()
+                self.__balance_chunk(xx, len(ll))
                 if rec:
-                    ubuf = self.seq_to_ords(buf)
+                    ubuf = filebytes.ords(filebytes.join(buf))
                     rbuf = ll[:len(ubuf)]
                     newsize = self.get_size()
                     if newsize == oldsize:
@@ -200,11 +199,10 @@ class Fileobj (rrbuf.Fileobj):
         for o in self.iter_chunk(x):
             ret, orig = o.delete(x, n)
             if rec:
-                buf.extend(orig) # str or int
+                buf.append(orig)
             if not len(o):
                 dead.append(o)
-            n -= ret
-            x += ret
+            n -= ret # x is now offset of the next chunk
             if n <= 0:
                 break # may not come here
 
@@ -213,16 +211,11 @@ class Fileobj (rrbuf.Fileobj):
             for o in dead:
                 self.cbuf.remove(o)
             self.mark_chunk()
-        size = 0
-        for o in self.cbuf:
-            o.offset = size
-            size += len(o)
-        self.set_size(size)
+        self.__sync_size(-(nn - n))
         self.set_dirty()
-        if self.__test_balance(nn):
-            self.__balance_chunk()
+        self.__balance_chunk(xx, 0)
         if rec:
-            buf = self.seq_to_ords(buf)
+            buf = filebytes.ords(filebytes.join(buf))
             def ufn(ref):
                 ref.insert(xx, buf, False)
                 return xx
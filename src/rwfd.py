@@ -22,10 +22,14 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from __future__ import division
+from __future__ import with_statement
 
+from . import directio
+from . import extent
 from . import filebytes
 from . import kernel
 from . import rofd
+from . import setting
 from . import util
 
 class Fileobj (rofd.Fileobj):
@@ -39,13 +43,16 @@ class Fileobj (rofd.Fileobj):
     def __init__(self, f, offset=0, length=0):
         super(Fileobj, self).__init__(f, offset, length)
         self.__dirty = False
-        self.__diff = {}
-        self.__bbuf = {}
+        self.__overlay = extent.ExtentMap() # relative offsets
+        self.__sync_bytes = 0
+        self.__sync_run = 0
+        self.__sync_call = 0
 
     def __str__(self):
         l = []
-        l.append("diff size {0}".format(util.get_size_repr(len(self.__diff))))
-        l.append("bbuf size {0}".format(util.get_size_repr(len(self.__bbuf))))
+        l.append(str(self.__overlay))
+        l.append("sync bytes {0}[B] run {1} call {2}".format(
+            self.__sync_bytes, self.__sync_run, self.__sync_call))
         return super(Fileobj, self).__str__() + "\n\n" + '\n'.join(l)
 
     def clear_dirty(self):
@@ -54,35 +61,95 @@ class Fileobj (rofd.Fileobj):
     def is_dirty(self):
         return self.__dirty
 
-    def __get_block_size(self):
+    def get_hole_map(self):
+        if len(self.__overlay): # may have replaced bytes within holes
+            return None
+        return super(Fileobj, self).get_hole_map()
+
+    def has_dirty_block(self, beg, end):
+        # beg and end are absolute offsets
+        offset = self.get_mapping_offset()
+        return self.__overlay.has_extent(beg - offset, end - offset)
+
+    def sync(self):
+        with self.lock:
+            for x, l in self.__iter_run():
+                self.__write_run(x, l)
+                self.invalidate_cache(x, x + sum(len(b) for b in l))
+            self.__overlay.clear()
+            kernel.fsync(self.fd)
+
+    def __iter_run(self):
+        # merge extents within the same or adjacent sectors into a run
+        # of buffers, sectors partially covered by extents are read first
+        offset = self.get_mapping_offset()
+        siz = self.get_align()
+        beg = end = -1
+        l = []
+        for x, buf in self.__overlay.iter_extent():
+            x += offset
+            if siz and l and util.rounddown(x, siz) <= util.roundup(end, siz):
+                l.append(self.__read_raw(end, x - end))
+            else:
+                if l:
+                    l.append(self.__read_tail(end))
+                    yield beg, l
+                beg = util.rounddown(x, siz) if siz else x
+                l = [self.__read_raw(beg, x - beg)]
+            l.append(buf)
+            end = x + len(buf)
+        if l:
+            l.append(self.__read_tail(end))
+            yield beg, l
+
+    def __read_tail(self, x):
         siz = self.get_align()
         if siz:
-            return siz
+            return self.__read_raw(x, util.roundup(x, siz) - x)
         else:
-            return kernel.get_page_size()
-
-    def sync(self):
-        siz = self.__get_block_size()
-        for lba in sorted(self.__bbuf.keys()):
-            self.fd.seek(lba * siz)
-            buf = filebytes.join(self.__bbuf[lba])
-            self.fd.write(buf)
-        self.__bbuf = {}
-        kernel.fsync(self.fd)
+            return filebytes.BLANK
+
+    def __read_raw(self, x, n):
+        if n <= 0:
+            return filebytes.BLANK
+        self.fd.seek(x)
+        b = self.fd.read(n) # may raise exception but don't catch
+        if len(b) != n:
+            raise IOError("Failed to read {0} bytes at {1}".format(n, x))
+        return b
+
+    def __write_run(self, x, l):
+        self.__sync_run += 1
+        limit = setting.sync_io_size_limit
+        if self.get_align():
+            limit = util.roundup(limit, self.get_align())
+        pwritev = kernel.has_pwritev() and \
+            not isinstance(self.fd, directio.DirectFile) # needs aligned buffer
+        if pwritev:
+            self.fd.flush() # also drop read buffer of buffered file object
+        for l in _split_buffer(l, limit):
+            n = sum(len(b) for b in l)
+            if pwritev:
+                self.__sync_call += kernel.pwritev(self.fd.fileno(), l, x)
+            else:
+                self.fd.seek(x)
+                self.fd.write(filebytes.join([b.tobytes() for b in l]))
+                self.__sync_call += 1
+            self.__sync_bytes += n
+            x += n
+        if pwritev:
+            self.fd.flush()
 
     def utime(self):
         super(Fileobj, self).utime()
-        self.__bbuf = {}
+        with self.lock:
+            self.__overlay.clear() # same as on-disk data if not dirty
 
     def read(self, x, n):
         b = super(Fileobj, self).read(x, n)
-        if not b or not self.__diff:
+        if not b or not len(self.__overlay):
             return b
-        l = filebytes.split(b)
-        for i in util.get_xrange(x, x + n):
-            if i in self.__diff:
-                l[i - x] = self.__diff[i]
-        return filebytes.join(l)
+        return self.__overlay.read(x, b)
 
     def replace(self, x, l, rec=True):
         # don't use buf for both ufn/rfn because ufn lose original buf
@@ -94,11 +161,9 @@ class Fileobj (rofd.Fileobj):
                 ref.replace(x, ubuf, False)
                 return x
 
-        for i, c in enumerate(l):
-            b = filebytes.input_to_bytes((c,))
-            self.__add_block_buffer(x + i, b) # call this first
-            self.__diff[x + i] = b # and then update diff
-        self.__dirty = not not self.__bbuf
+        with self.lock:
+            self.__overlay.replace(x, filebytes.input_to_bytes(l))
+        self.__dirty = len(self.__overlay) > 0
 
         if rec:
             rbuf = l[:]
@@ -107,16 +172,20 @@ class Fileobj (rofd.Fileobj):
                 return x
             self.add_undo(ufn, rfn)
 
-    def __add_block_buffer(self, x, b):
-        siz = self.__get_block_size()
-        x += self.get_mapping_offset() # abs offset
-        lba = x // siz
-        pos = x % siz
-
-        if lba in self.__bbuf:
-            self.__bbuf[lba][pos] = b
-        else:
-            self.fd.seek(lba * siz)
-            buf = self.fd.read(siz) # may raise exception but don't catch
-            self.__bbuf[lba] = filebytes.split(buf)
-            self.__bbuf[lba][pos] = b
+def _split_buffer(l, limit):
+    """Yield lists of buffers with total size of at most limit"""
+    ret = []
+    n = 0
+    for b in l:
+        b = memoryview(b)
+        while len(b):
+            siz = min(len(b), limit - n)
+            ret.append(b[:siz])
+            b = b[siz:]
+            n += siz
+            if n == limit:
+                yield ret
+                ret = []
+                n = 0
+    if ret:
+        yield ret
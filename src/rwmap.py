@@ -44,8 +44,19 @@ class Fileobj (rrmap.Fileobj):
         self.__dead = False
         self.__sync = 0
         self.__anon = None
+        self.__gap_x = -1 # logical offset of gap
+        self.__gap_buf = bytearray() # inserted bytes at gap
+        self.__gap_del = 0 # deleted mapping bytes at gap
+        self.__gap_flush = 0
         super(Fileobj, self).__init__(f, offset, length)
 
+    def __str__(self):
+        l = []
+        l.append("gap offset {0} insert {1} delete {2}".format(self.__gap_x,
+            len(self.__gap_buf), self.__gap_del))
+        l.append("gap flush {0}".format(self.__gap_flush))
+        return super(Fileobj, self).__str__() + "\n\n" + '\n'.join(l)
+
     def ctr(self):
         if self.is_mappable():
             super(Fileobj, self).ctr()
@@ -65,6 +76,7 @@ class Fileobj (rrmap.Fileobj):
             shcopy = False
         else:
             shcopy = self.__flush_anon()
+        self.__flush_gap()
         self.cleanup_mapping()
 
         if not self.__anon:
@@ -114,10 +126,81 @@ class Fileobj (rrmap.Fileobj):
 
     def get_size(self):
         if not self.__dead:
-            return super(Fileobj, self).get_size()
+            return super(Fileobj, self).get_size() + len(self.__gap_buf) - \
+                self.__gap_del
         else:
             return 0
 
+    def clear_dirty(self):
+        self.__flush_gap()
+        super(Fileobj, self).clear_dirty()
+
+    def find(self, x, s, end):
+        self.__flush_gap()
+        return super(Fileobj, self).find(x, s, end)
+
+    def rfind(self, x, s, end):
+        self.__flush_gap()
+        return super(Fileobj, self).rfind(x, s, end)
+
+    def read(self, x, n):
+        if self.__gap_x == -1:
+            return super(Fileobj, self).read(x, n)
+        # mapping before gap, gap, and then mapping after gap
+        beg = self.__gap_x
+        end = beg + len(self.__gap_buf)
+        delta = self.__gap_del - len(self.__gap_buf)
+        xx = min(x + n, self.get_size())
+        l = []
+        if x < beg:
+            l.append(self.map[x : min(xx, beg)])
+        if x < end and xx > beg:
+            b = self.__gap_buf[max(x, beg) - beg : min(xx, end) - beg]
+            l.append(bytes(b))
+        if xx > end:
+            l.append(self.map[max(x, end) + delta : xx + delta])
+        return filebytes.join(l)
+
+    def __is_in_gap(self, beg, end):
+        # [beg, end) overlaps or is adjacent to gap
+        return self.__gap_x != -1 and \
+            beg <= self.__gap_x + len(self.__gap_buf) and end >= self.__gap_x
+
+    def __start_gap(self, x):
+        # don't stage edits of an empty buffer
+        if self.__gap_x == -1 and not self.__dead and not self.is_empty():
+            self.__gap_x = x
+        return self.__gap_x != -1
+
+    def __test_gap_size(self):
+        if len(self.__gap_buf) + self.__gap_del > setting.map_gap_size_limit:
+            self.__flush_gap()
+
+    def __flush_gap(self):
+        # move mapping after gap by insert/delete delta, and then copy gap
+        if self.__gap_x == -1:
+            return
+        x = self.__gap_x
+        n = len(self.__gap_buf)
+        size = len(self.map)
+        tail = size - (x + self.__gap_del)
+        if n > self.__gap_del:
+            self.map.resize(size + n - self.__gap_del)
+            self.map.move(x + n, x + self.__gap_del, tail)
+        elif n < self.__gap_del:
+            self.map.move(x + n, x + self.__gap_del, tail)
+            self.map.resize(size + n - self.__gap_del)
+        if n:
+            self.map[x : x + n] = bytes(self.__gap_buf)
+        self.__gap_x = -1
+        self.__gap_buf = bytearray()
+        self.__gap_del = 0
+        self.__gap_flush += 1
+
+    def __resize_map(self, n):
+        self.__flush_gap()
+        self.map.resize(n)
+
     def sync(self):
         self.clear_dirty() # flush mmap
         self.update_fstat(self.__get_backing_path())
@@ -148,9 +231,17 @@ class Fileobj (rrmap.Fileobj):
                 return x
             self.add_undo(ufn, rfn)
 
-        self.map.resize(size + n)
-        self.map.move(xx, x, size - x)
-        self.map[x:xx] = filebytes.input_to_bytes(l)
+        if not self.__is_in_gap(x, x):
+            self.__flush_gap()
+            self.__start_gap(x)
+        if self.__gap_x != -1:
+            i = x - self.__gap_x
+            self.__gap_buf[i:i] = filebytes.input_to_bytes(l)
+            self.__test_gap_size()
+        else:
+            self.map.resize(size + n)
+            self.map.move(xx, x, size - x)
+            self.map[x:xx] = filebytes.input_to_bytes(l)
         self.set_dirty()
         self.__die(False)
 
@@ -161,9 +252,25 @@ class Fileobj (rrmap.Fileobj):
         size = self.get_size()
         n = len(l)
         xx = x + n
+        beg = self.__gap_x
+        if beg != -1 and beg <= x and xx <= beg + len(self.__gap_buf):
+            if rec:
+                ubuf = filebytes.ords(self.read(x, n))
+                rbuf = l[:]
+                def ufn(ref):
+                    ref.replace(x, ubuf, False)
+                    return x
+                def rfn(ref):
+                    ref.replace(x, rbuf, False)
+                    return x
+                self.add_undo(ufn, rfn)
+            self.__gap_buf[x - beg : xx - beg] = filebytes.input_to_bytes(l)
+            self.set_dirty()
+            return
+        self.__flush_gap()
         resized = False
         if x + n > size:
-            self.map.resize(x + n)
+            self.__resize_map(x + n)
             resized = True
 
         if rec:
@@ -179,11 +286,11 @@ class Fileobj (rrmap.Fileobj):
                 self.add_undo(ufn1, rfn1)
             else:
                 def ufn2(ref):
-                    ref.map.resize(size) # shrink
+                    ref.__resize_map(size) # shrink
                     ref.replace(x, ubuf[:size - x], False)
                     return x
                 def rfn2(ref):
-                    ref.map.resize(x + n) # expand
+                    ref.__resize_map(x + n) # expand
                     ref.replace(x, rbuf, False)
                     return x
                 self.add_undo(ufn2, rfn2)
@@ -207,13 +314,34 @@ class Fileobj (rrmap.Fileobj):
                 return x
             self.add_undo(ufn, rfn)
 
-        self.map.move(x, xx, size - xx)
-        if size > n:
-            self.map.resize(size - n)
+        if size <= n: # delete all
+            self.__flush_gap()
+        elif not self.__is_in_gap(x, xx):
+            self.__flush_gap()
+            self.__start_gap(x)
+        if self.__gap_x != -1:
+            self.__delete_gap(x, n)
+            self.__test_gap_size()
         else:
-            self.__die()
+            self.map.move(x, xx, size - xx)
+            if size > n:
+                self.map.resize(size - n)
+            else:
+                self.__die()
         self.set_dirty()
 
+    def __delete_gap(self, x, n):
+        # delete mapping bytes before and after gap, and bytes within gap
+        beg = self.__gap_x
+        end = beg + len(self.__gap_buf)
+        xx = x + n
+        if x < beg:
+            self.__gap_del += beg - x
+            self.__gap_x = x
+        if xx > end:
+            self.__gap_del += xx - end
+        del self.__gap_buf[max(x, beg) - beg : min(xx, end) - beg]
+
     def truncate(self, n, rec=True):
         size = self.get_size()
         if size == n:
@@ -233,24 +361,25 @@ class Fileobj (rrmap.Fileobj):
             raise fileobj.Error("Can not truncate to {0}".format(
                 util.get_size_repr(n)))
 
+        self.__flush_gap()
         if rec:
             if n > size: # expand
                 def ufn(ref):
-                    ref.map.resize(size) # shrink
+                    ref.__resize_map(size) # shrink
                     self.set_dirty()
                     return size - 1
                 def rfn(ref):
-                    ref.map.resize(n) # expand
+                    ref.__resize_map(n) # expand
                     self.set_dirty()
                     return size - 1
             else: # shrink
                 assert setting.use_truncate_shrink
                 def ufn(ref):
-                    ref.map.resize(size) # expand
+                    ref.__resize_map(size) # expand
                     self.set_dirty()
                     return n - 1
                 def rfn(ref):
-                    ref.map.resize(n) # shrink
+                    ref.__resize_map(n) # shrink
                     self.set_dirty()
                     return n - 1
             self.add_undo(ufn, rfn)
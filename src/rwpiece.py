@@ -0,0 +1,144 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import with_statement
+import os
+
+from . import filebytes
+from . import fileobj
+from . import kernel
+from . import piece
+from . import rrbuf
+from . import search
+from . import util
+
+class Fileobj (rrbuf.Fileobj):
+    _insert   = True
+    _replace  = True
+    _delete   = True
+    _truncate = False
+    _enabled  = True
+    _partial  = True
+
+    def __init__(self, f, offset=0, length=0):
+        self.ptbl = None
+        super(Fileobj, self).__init__(f, offset, length)
+
+    def __str__(self):
+        l = []
+        l.append("size " + util.get_size_repr(self.get_size()))
+        l.append(str(self.ptbl))
+        return '\n'.join(l)
+
+    def ctr(self):
+        f = self.get_path()
+        if os.path.isfile(f):
+            with kernel.fopen(f) as fd:
+                fd.seek(self.get_mapping_offset())
+                length = self.get_mapping_length()
+                if length:
+                    self.init_chunk(fd.read(length))
+                else:
+                    self.init_chunk(fd.read())
+        else:
+            self.init_chunk(filebytes.BLANK)
+
+    def init_chunk(self, b):
+        if isinstance(b, str):
+            b = util.str_to_bytes(b)
+        self.ptbl = piece.PieceTable(b)
+
+    def get_size(self):
+        return len(self.ptbl)
+
+    def find(self, x, s, end):
+        return search.find(self, x, s, end)
+
+    def rfind(self, x, s, end):
+        return search.rfind(self, x, s, end)
+
+    def read(self, x, n):
+        return self.ptbl.read(x, n)
+
+    def insert(self, x, l, rec=True):
+        n = self.ptbl.insert(x, filebytes.input_to_bytes(l))
+        self.set_dirty()
+        if rec:
+            buf = l[:n]
+            def ufn(ref):
+                ref.delete(x, n, False)
+                return x
+            def rfn(ref):
+                ref.insert(x, buf, False)
+                return x
+            self.add_undo(ufn, rfn)
+
+    def replace(self, x, l, rec=True):
+        if self.is_empty():
+            self.insert(x, l, rec)
+            return
+        oldsize = self.get_size()
+        n = len(l)
+        siz = n
+        if x + siz > oldsize:
+            siz = oldsize - x
+        orig = self.ptbl.delete(x, siz)
+        self.ptbl.insert(x, filebytes.input_to_bytes(l))
+        self.set_dirty()
+        if rec:
+            ubuf = filebytes.ords(orig)
+            rbuf = l[:]
+            newsize = self.get_size()
+            if newsize == oldsize:
+                def ufn1(ref):
+                    ref.replace(x, ubuf, False)
+                    return x
+                def rfn1(ref):
+                    ref.replace(x, rbuf, False)
+                    return x
+                self.add_undo(ufn1, rfn1)
+            else:
+                assert newsize > oldsize
+                def ufn2(ref): # shrink
+                    ref.replace(x, ubuf, False)
+                    ref.delete(oldsize, x + n - oldsize, False)
+                    return x
+                def rfn2(ref): # expand
+                    ref.replace(x, rbuf, False)
+                    return x
+                self.add_undo(ufn2, rfn2)
+
+    def delete(self, x, n, rec=True):
+        if self.is_empty():
+            raise fileobj.Error("Empty buffer")
+        orig = self.ptbl.delete(x, n)
+        self.set_dirty()
+        if rec:
+            buf = filebytes.ords(orig)
+            def ufn(ref):
+                ref.insert(x, buf, False)
+                return x
+            def rfn(ref):
+                ref.delete(x, n, False)
+                return x
+            self.add_undo(ufn, rfn)
@@ -162,6 +162,9 @@ def __test_stream():
 def doupdate():
     _screen.doupdate()
 
+def has_input(scr):
+    return _screen.has_input(scr)
+
 def flash():
     # ignore flash if in stream (too slow depending on stream size)
     if not __test_stream():
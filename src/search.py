@@ -0,0 +1,489 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from __future__ import division
+import array
+import bisect
+import re
+import string
+import time
+
+from . import filebytes
+from . import fileobj
+from . import log
+from . import screen
+from . import setting
+from . import util
+
+# Streaming search shared by Fileobj classes which provide read(),
+# get_size() and get_buffer_size().  Data is read in blocks aligned to
+# the block size, and a match across a block boundary is searched in a
+# small buffer of len(s)-1 bytes from each side, so blocks are neither
+# re-read nor concatenated.
+
+def find(fo, x, s, end=-1):
+    # s must start in [x, end) and may end after end
+    size = fo.get_size()
+    if end == -1 or end > size:
+        end = size
+    if x < 0:
+        x = 0
+    if x >= end:
+        return fileobj.NOTFOUND
+    keep = len(s) - 1
+    bufsiz = get_block_size(fo, len(s))
+    stat = _Stat()
+    tail = filebytes.BLANK
+    while True:
+        if x >= end + keep or x >= size:
+            ret = fileobj.NOTFOUND
+            break
+        n = util.rounddown(x, bufsiz) + bufsiz - x
+        b = fo.read(x, n)
+        if not b:
+            ret = fileobj.NOTFOUND
+            break
+        stat.add(len(b))
+        ret = __find_block(x, s, b, tail)
+        if ret != fileobj.NOTFOUND:
+            if ret >= end:
+                ret = fileobj.NOTFOUND
+            break
+        if keep:
+            tail = (tail + b[-keep:])[-keep:]
+        x += len(b)
+        if screen.test_signal():
+            ret = fileobj.INTERRUPT
+            break
+    stat.log("find", len(s))
+    return ret
+
+def __find_block(x, s, b, tail):
+    if tail:
+        i = util.find_string(tail + b[:len(s) - 1], s)
+        if i >= 0:
+            return x - len(tail) + i
+    i = util.find_string(b, s)
+    if i >= 0:
+        return x + i
+    return fileobj.NOTFOUND
+
+def rfind(fo, x, s, end=-1):
+    # s must be within [0, x] and start after end
+    size = fo.get_size()
+    if x >= size:
+        x = size - 1
+    if x < 0 or x <= end:
+        return fileobj.NOTFOUND
+    keep = len(s) - 1
+    bufsiz = get_block_size(fo, len(s))
+    stat = _Stat()
+    head = filebytes.BLANK
+    x += 1 # exclusive
+    while True:
+        if x <= end + 1:
+            ret = fileobj.NOTFOUND
+            break
+        i = util.rounddown(x - 1, bufsiz)
+        b = fo.read(i, x - i)
+        if not b:
+            ret = fileobj.NOTFOUND
+            break
+        stat.add(len(b))
+        ret = __rfind_block(i, s, b, head)
+        if ret != fileobj.NOTFOUND:
+            if ret <= end:
+                ret = fileobj.NOTFOUND
+            break
+        if keep:
+            head = (b[:keep] + head)[:keep]
+        x = i
+        if screen.test_signal():
+            ret = fileobj.INTERRUPT
+            break
+    stat.log("rfind", len(s))
+    return ret
+
+def __rfind_block(x, s, b, head):
+    if head:
+        keep = len(s) - 1
+        bb = b[-keep:]
+        i = util.rfind_string(bb + head, s)
+        if i >= 0:
+            return x + len(b) - len(bb) + i
+    i = util.rfind_string(b, s)
+    if i >= 0:
+        return x + i
+    return fileobj.NOTFOUND
+
+def get_block_size(fo, n):
+    ret = fo.get_buffer_size()
+    if ret < n:
+        ret = n
+    return ret
+
+class _Stat (object):
+    def __init__(self):
+        self.time = time.time()
+        self.size = 0
+
+    def add(self, n):
+        self.size += n
+
+    def log(self, name, n):
+        t = time.time() - self.time
+        if t > 0:
+            mbps = self.size / t / util.MB
+        else:
+            mbps = 0
+        log.debug("{0} {1}[B] read {2}[B] in {3:.3f}[s] {4:.1f}[MB/s]".format(
+            name, n, self.size, t, mbps))
+
+# Pattern search with a compiled bytes regex.
+#   \R<regex>  regular expression, e.g. \R\x7fELF[\x01\x02]
+#   \M<mask>   hex bytes with ? as a wildcard nibble, e.g. \MDE ?? BE EF
+# A match is assumed to be at most Pattern.size bytes long, which is also
+# the size of lookbehind data given before the search position.
+class Pattern (object):
+    def __init__(self, word, regex, size):
+        self.word = word
+        self.regex = regex
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return self.word
+
+    def find(self, fo, x, end):
+        return find_pattern(fo, x, self, end)
+
+    def rfind(self, fo, x, end):
+        return rfind_pattern(fo, x, self, end)
+
+    def iter_match(self, b):
+        for m in self.regex.finditer(b):
+            if m.end() > m.start():
+                yield m.start(), m.end() - m.start()
+
+class PatternError (fileobj.Error):
+    pass
+
+_pattern_cache = {}
+
+def get_pattern(word):
+    # cached per search history entry
+    k = word, setting.use_ignorecase
+    if k in _pattern_cache:
+        return _pattern_cache[k]
+    if len(_pattern_cache) >= setting.max_history:
+        _pattern_cache.clear()
+    ret = _pattern_cache[k] = __compile_pattern(word)
+    return ret
+
+def __compile_pattern(word):
+    if word.startswith("\\R"):
+        regex = util.str_to_bytes(word[len("\\R"):])
+        size = setting.search_lookbehind_size
+    elif word.startswith("\\M"):
+        regex, size = __mask_to_regex(word[len("\\M"):])
+    else:
+        return None
+    flags = re.DOTALL
+    if setting.use_ignorecase:
+        flags |= re.IGNORECASE
+    try:
+        return Pattern(word, re.compile(regex, flags), size)
+    except Exception as e:
+        raise PatternError("Invalid pattern {0}: {1}".format(word, e))
+
+def __mask_to_regex(s):
+    s = ''.join(s.split())
+    if not s or len(s) % 2:
+        raise PatternError("Invalid mask " + s)
+    l = []
+    for i in util.get_xrange(0, len(s), 2):
+        t = s[i : i + 2]
+        if t == "??":
+            l.append(".")
+        elif all(c in string.hexdigits for c in t):
+            l.append("\\x" + t)
+        elif t[0] == "?" and t[1] in string.hexdigits:
+            x = int(t[1], 16)
+            l.append("[{0}]".format(''.join(["\\x{0:02x}".format((j << 4) | x)
+                for j in util.get_xrange(16)])))
+        elif t[0] in string.hexdigits and t[1] == "?":
+            x = int(t[0], 16) << 4
+            l.append("[\\x{0:02x}-\\x{1:02x}]".format(x, x | 0xF))
+        else:
+            raise PatternError("Invalid mask " + t)
+    return util.str_to_bytes(''.join(l)), len(l)
+
+def find_pattern(fo, x, pat, end=-1):
+    # match must start in [x, end)
+    size = fo.get_size()
+    if end == -1 or end > size:
+        end = size
+    if x < 0:
+        x = 0
+    if x >= end:
+        return fileobj.NOTFOUND
+    keep = pat.size
+    bufsiz = get_block_size(fo, keep)
+    stat = _Stat()
+    i = max(x - keep, 0)
+    buf = fo.read(i, x - i) # lookbehind
+    base = i # offset of buf[0]
+    pos = x - i # search from buf[pos]
+    while True:
+        n = util.rounddown(x, bufsiz) + bufsiz - x
+        b = fo.read(x, n)
+        stat.add(len(b))
+        x += len(b)
+        buf += b
+        eof = not b or x >= size
+        # a match starting before buf[done] doesn't depend on data after buf
+        if eof:
+            done = len(buf)
+        else:
+            done = max(len(buf) - keep, pos)
+        m = pat.regex.search(buf, pos)
+        if m and (m.start() < done or eof):
+            ret = base + m.start()
+            if ret >= end:
+                ret = fileobj.NOTFOUND
+            break
+        if eof or base + done >= end:
+            ret = fileobj.NOTFOUND
+            break
+        i = max(done - keep, 0)
+        buf = buf[i:]
+        base += i
+        pos = done - i
+        if screen.test_signal():
+            ret = fileobj.INTERRUPT
+            break
+    stat.log("find_pattern", keep)
+    return ret
+
+def rfind_pattern(fo, x, pat, end=-1):
+    # match must start in (end, x]
+    size = fo.get_size()
+    if x >= size:
+        x = size - 1
+    if x < 0 or x <= end:
+        return fileobj.NOTFOUND
+    keep = pat.size
+    bufsiz = get_block_size(fo, keep)
+    stat = _Stat()
+    head = fo.read(x + 1, keep) # for a match starting at x
+    x += 1 # exclusive
+    while True:
+        i = util.rounddown(x - 1, bufsiz)
+        j = max(i - keep, 0) # lookbehind
+        b = fo.read(j, x - j)
+        stat.add(len(b))
+        if len(b) <= i - j:
+            ret = fileobj.NOTFOUND
+            break
+        buf = b + head
+        ret = __rsearch(pat.regex, buf, i - j, x - j - 1, keep)
+        if ret != -1:
+            ret += j
+            if ret <= end:
+                ret = fileobj.NOTFOUND
+            break
+        if i <= end + 1:
+            ret = fileobj.NOTFOUND
+            break
+        head = buf[i - j : i - j + keep]
+        x = i
+        if screen.test_signal():
+            ret = fileobj.INTERRUPT
+            break
+    stat.log("rfind_pattern", keep)
+    return ret
+
+def __rsearch(regex, b, lo, hi, keep):
+    # last match starting in [lo, hi], search() returns the first one
+    # starting at or after given position, so bisect the position
+    endpos = min(hi + keep + 1, len(b))
+    m = regex.search(b, lo, endpos)
+    if not m or m.start() > hi:
+        return -1
+    ret = m.start()
+    lo = ret + 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        m = regex.search(b, mid, endpos)
+        if m and m.start() <= hi:
+            ret = m.start()
+            lo = ret + 1
+        else:
+            hi = mid - 1
+    return ret
+
+try:
+    array.array('Q')
+    _typecode = 'Q'
+except ValueError: # Python 2
+    _typecode = 'L'
+
+# Offsets of all matches of a search word, built in steps while waiting
+# for input, and updated on edit by dropping matches near the edited range
+# and scanning it again.
+class MatchIndex (object):
+    def __init__(self, word, size):
+        self.word = word
+        self.ignorecase = setting.use_ignorecase
+        if isinstance(word, filebytes.TYPE):
+            self.margin = len(word)
+        else:
+            self.margin = word.size
+        self.reset(size)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __str__(self):
+        return "{0} matches, {1} ranges to scan{2}".format(len(self),
+            len(self.pending), " <overflow>" * self.overflow)
+
+    def reset(self, size):
+        self.array = array.array(_typecode)
+        self.pending = [[0, size]] # ranges to scan
+        self.overflow = False
+
+    def test_word(self, word):
+        return self.word == word and \
+            self.ignorecase == setting.use_ignorecase
+
+    def is_complete(self):
+        return not self.pending and not self.overflow
+
+    def step(self, fo, n):
+        # scan up to n bytes of the first pending range
+        if not self.pending or self.overflow:
+            return -1
+        beg, end = self.pending[0]
+        size = fo.get_size()
+        if end > size:
+            end = size
+        lim = min(beg + n, end)
+        if beg < lim:
+            l = _find_all(fo, self.word, beg, lim)
+            a = self.array
+            i = bisect.bisect_left(a, beg)
+            j = bisect.bisect_left(a, lim)
+            a[i:j] = array.array(_typecode, l)
+        if lim >= end:
+            self.pending.pop(0)
+        else:
+            self.pending[0][0] = lim
+        if len(self.array) > setting.search_index_limit:
+            log.debug("Search index overflow {0}".format(len(self.array)))
+            self.overflow = True
+
+    def insert(self, x, n):
+        self.__update(x, 0, n)
+
+    def replace(self, x, n):
+        self.__update(x, n, n)
+
+    def delete(self, x, n):
+        self.__update(x, n, 0)
+
+    def __update(self, x, old, new):
+        # [x, x+old) has been replaced with new bytes
+        beg = max(x - self.margin, 0)
+        end = x + old + self.margin
+        d = new - old
+        a = self.array
+        i = bisect.bisect_left(a, beg)
+        j = bisect.bisect_left(a, end)
+        if d:
+            b = array.array(_typecode, [v + d for v in a[j:]])
+            del a[i:]
+            a.extend(b)
+        else:
+            del a[i:j]
+        def _(v):
+            if v >= x + old:
+                return v + d
+            elif v >= x:
+                return x
+            else:
+                return v
+        l = [[_(b), _(e)] for b, e in self.pending]
+        l.append([beg, x + new + self.margin])
+        l.sort()
+        self.pending = []
+        for b, e in l:
+            if b >= e:
+                continue
+            if self.pending and b <= self.pending[-1][1]:
+                if e > self.pending[-1][1]:
+                    self.pending[-1][1] = e
+            else:
+                self.pending.append([b, e])
+
+    def find(self, x, end=-1):
+        a = self.array
+        i = bisect.bisect_left(a, x)
+        if i < len(a) and (end == -1 or a[i] < end):
+            return a[i]
+        return fileobj.NOTFOUND
+
+    def rfind(self, x, end=-1):
+        if isinstance(self.word, filebytes.TYPE):
+            x -= len(self.word) - 1 # must end by x
+        a = self.array
+        i = bisect.bisect_right(a, x) - 1
+        if i >= 0 and a[i] > end:
+            return a[i]
+        return fileobj.NOTFOUND
+
+def _find_all(fo, word, beg, end):
+    # offsets of all matches starting in [beg, end)
+    l = []
+    if isinstance(word, filebytes.TYPE):
+        b = fo.read(beg, end - beg + len(word) - 1)
+        if setting.use_ignorecase:
+            b = b.lower()
+            word = word.lower()
+        i = b.find(word)
+        while i != -1 and beg + i < end:
+            l.append(beg + i)
+            i = b.find(word, i + 1)
+    else:
+        i = max(beg - word.size, 0) # lookbehind
+        b = fo.read(i, end - i + word.size)
+        pos = beg - i
+        while True:
+            m = word.regex.search(b, pos)
+            if not m or i + m.start() >= end:
+                break
+            l.append(i + m.start())
+            pos = m.start() + 1
+    return l
@@ -61,6 +61,9 @@ def get_marks_path():
 def get_session_path():
     return os.path.join(get_user_dir(), "session" + _get_suffix())
 
+def get_manifest_dir():
+    return os.path.join(get_user_dir(), "manifest")
+
 def get_stream_path():
     return __get_path("path_stream")
 
@@ -94,6 +94,9 @@ def newwin(leny, lenx, begy, begx, ref=None):
     scr.init()
     return scr
 
+def has_input(scr):
+    return True # stdin isn't polled
+
 def get_size():
     return -1, -1
 
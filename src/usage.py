@@ -147,12 +147,22 @@ Print python(1) site-package directory and exit.
 md = _("""
 Print message digest of files using <hash_algorithm> and exit.
 Defaults to "sha256".
+Multiple hash algorithms can be specified separated by "," (e.g. "sha256,md5").
+To use and update manifest of files under ~/.fileobj/manifest, append ",manifest" to option string (e.g. "sha256,manifest").
+Blocks of files changed since the previous run and of block devices are read again, except for holes.
 """)
 md_metavar = _metavar("hash_algorithm")
 
 blkcmp = _("""
-Compare contents of files and exit.
+Compare contents of files using <cmp_type> and exit.
+Available options are "raw", "crc32" and "<hash_algorithm>".
+Defaults to "raw".
+To print digest of each block instead of mismatched blocks, append ",digest" to option string (e.g. "sha256,digest").
+To use and update manifest of files under ~/.fileobj/manifest, append ",manifest" to option string (e.g. "sha256,manifest").
+Blocks of files changed since the previous run and of block devices are read again, except for holes.
+If followed by an existing path instead of <cmp_type>, the path is compared using "raw" (use --blkcmp=<cmp_type> for a path named as <cmp_type>).
 """)
+blkcmp_metavar = _metavar("cmp_type")
 
 blkdump = _("""
 Print contents of files to stdout and exit.
@@ -167,6 +177,8 @@ blkscan = _("""
 Print file offsets of matched logical blocks and exit.
 Available options are "zero", "nonzero", "ff", "nonff", "<hash_algorithm>:<value>" and "<hash_algorithm>".
 Defaults to "zero".
+Multiple scan types can be specified separated by "," (e.g. "zero,ff").
+To print bitmap of matched blocks instead of file offsets, append ",bitmap" to option string (e.g. "zero,bitmap").
 If multiple files are specified, this command assumes a single concatenated file.
 To handle them separately, append "x" to option string (e.g. "zerox").
 """)
@@ -251,6 +263,21 @@ If defined, use lower case for alphabets in hexadecimal.
 Defaults to upper case.
 """)
 
+FILEOBJ_USE_PREFETCH = _("""
+If defined, read contents of files not mmap'd (e.g. block devices) ahead in background while idle.
+Defaults to read on demand.
+""")
+
+FILEOBJ_USE_DIRECT_IO = _("""
+If defined, use direct I/O (O_DIRECT) for block devices, or tell kernel not to cache them if unavailable.
+Defaults to use page cache.
+""")
+
+FILEOBJ_USE_MADVISE = _("""
+If set to "false", do not give kernel access pattern hints (madvise) for mmap'd buffers.
+Defaults to use madvise if undefined.
+""")
+
 FILEOBJ_BUFFER_SIZE = _("""
 Set custom buffer size if larger than 0.
 Defaults to 0.
@@ -339,3 +366,8 @@ FILEOBJ_DISAS_PRIVATE = _("""
 Set FILEOBJ_DISAS_ARCH specific data for d command.
 Defaults to use 64 bit mode on x86 if undefined.
 """)
+
+FILEOBJ_WORKER_COUNT = _("""
+Set number of workers for --md, --blkcmp and --blkscan if larger than 1.
+Defaults to 1.
+""")
@@ -518,6 +518,7 @@ class _console (console.Console):
         self.add_method(literal.s_sector,        this,    "_queue_input")
         self.add_method(literal.s_argv,          this,    "_queue_input")
         self.add_method(literal.s_args,          this,    "_queue_input")
+        self.add_method(literal.s_matches,       this,    "_queue_input")
         self.add_method(literal.s_md5,           this,    "_show_md5")
         self.add_method(literal.s_sha1,          this,    "_show_sha1")
         self.add_method(literal.s_sha224,        this,    "_show_sha224")
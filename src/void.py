@@ -111,6 +111,7 @@ class _console (console.Console):
         self.add_method(literal.s_sector,        methods, "show_sector_size")
         self.add_method(literal.s_argv,          methods, "show_argv")
         self.add_method(literal.s_args,          methods, "show_args")
+        self.add_method(literal.s_matches,       methods, "show_matches")
         self.add_method(literal.s_md5,           methods, "show_md5")
         self.add_method(literal.s_sha1,          methods, "show_sha1")
         self.add_method(literal.s_sha224,        methods, "show_sha224")
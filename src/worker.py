@@ -0,0 +1,88 @@
+# Copyright (c) 2026, Tomohiro Kusumi
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import multiprocessing
+import multiprocessing.pool
+import threading
+
+from . import setting
+from . import util
+
+if util.is_python2():
+    import Queue as queue
+else:
+    import queue
+
+# per worker thread (or process) state set by pool initializer
+local = threading.local()
+
+def get_count():
+    return setting.worker_count
+
+def is_parallel():
+    return get_count() > 1
+
+def use_process(opsl):
+    # threads for block devices (I/O bound), processes otherwise
+    s = setting.worker_type
+    if s == "thread":
+        return False
+    elif s == "process":
+        return True
+    else:
+        return not any(ops.is_blk() for ops in opsl)
+
+def alloc_pool(process, initializer=None, initargs=()):
+    n = get_count()
+    if process:
+        return multiprocessing.Pool(n, initializer, initargs)
+    else:
+        return multiprocessing.pool.ThreadPool(n, initializer, initargs)
+
+def alloc_thread_pool(l):
+    # each thread takes one of l as local.arg
+    assert len(l) == get_count(), (len(l), get_count())
+    q = queue.Queue()
+    for x in l:
+        q.put(x)
+    return alloc_pool(False, __init_thread, (q,))
+
+def alloc_process_pool(fn, *args):
+    # each process sets fn(*args) as local.arg
+    return alloc_pool(True, __init_process, (fn, args))
+
+def __init_thread(q):
+    local.arg = q.get()
+
+def __init_process(fn, args):
+    local.arg = fn(*args)
+
+def get_stripe_size(blksiz):
+    return util.roundup(setting.worker_stripe_size, blksiz)
+
+def iter_stripe(size, stripe):
+    beg = 0
+    while beg < size:
+        end = min(beg + stripe, size)
+        yield beg, end
+        beg = end